@@ -1,29 +1,137 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, UploadFile, File, Form, Header, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse, FileResponse, JSONResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import Optional, List
+from contextlib import asynccontextmanager, aclosing
 import httpx
+import orjson
+from cachetools import TTLCache
 import logging
 import websockets
 import asyncio
+import hashlib
 import tempfile
 import os
 
-logging.basicConfig(level=logging.INFO)
+try:
+    # aiohttp-backed transport for httpx; holds up far better under high concurrency
+    from httpx_aiohttp import AiohttpTransport
+except ImportError:
+    AiohttpTransport = None
+
+try:
+    # httpx needs the h2 package for HTTP/2 support
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    # JSON line logs rendered with orjson instead of stdlib %-formatting
+    import structlog
+except ImportError:
+    structlog = None
+
+def _configure_logging():
+    """Route stdlib logging through structlog's JSON renderer when available"""
+    if structlog is None:
+        logging.basicConfig(level=logging.INFO)
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(
+                serializer=lambda obj, **kw: orjson.dumps(obj, default=str).decode()
+            ),
+        ],
+    ))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+
+_configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Services Gateway")
+# Upstream connection pool (httpx defaults of 100/20 stall under burst fan-out)
+UPSTREAM_LIMITS = httpx.Limits(
+    max_connections=1000,
+    max_keepalive_connections=100,
+    keepalive_expiry=30.0
+)
+UPSTREAM_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one upstream HTTP client (and its connection pool) across requests"""
+    # The aiohttp transport is HTTP/1.1 only. Without it, httpx's own transport
+    # multiplexes requests over HTTP/2 to any upstream that negotiates h2 and
+    # falls back to HTTP/1.1 for the rest.
+    transport = AiohttpTransport(limits=UPSTREAM_LIMITS) if AiohttpTransport else None
+    app.state.http = httpx.AsyncClient(
+        transport=transport,
+        http2=HTTP2_AVAILABLE and transport is None,
+        limits=UPSTREAM_LIMITS,
+        timeout=UPSTREAM_TIMEOUT
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+app = FastAPI(
+    title="AI Services Gateway",
+    lifespan=lifespan
+)
 
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["https://nomability.net", "https://api.nomability.net"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists plus a day-long max_age let browsers cache preflights
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization", "X-Download"],
+    expose_headers=["Content-Disposition"],
+    max_age=86400,
 )
 
+# Compress sizeable JSON replies (/tts/info, Ollama chat, OCR)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# ============= Upstream Error Mapping =============
+
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout_handler(request: Request, exc: httpx.TimeoutException):
+    logger.error("Upstream timeout on %s", request.url.path, exc_info=exc)
+    return JSONResponse(status_code=504, content={"detail": "Upstream service timed out"})
+
+@app.exception_handler(httpx.RequestError)
+async def upstream_error_handler(request: Request, exc: httpx.RequestError):
+    logger.error("Upstream request failed on %s", request.url.path, exc_info=exc)
+    return JSONResponse(status_code=502, content={"detail": f"Upstream service unavailable: {exc}"})
+
+@app.exception_handler(httpx.HTTPStatusError)
+async def upstream_status_handler(request: Request, exc: httpx.HTTPStatusError):
+    logger.warning("Upstream %s returned %s", exc.request.url, exc.response.status_code)
+    return JSONResponse(status_code=exc.response.status_code, content={"detail": exc.response.text})
+
+# Audio gains nothing from gzip, and gzip would hold back streamed SSE/NDJSON chunks
+UNCOMPRESSED_MEDIA_TYPES = ("audio/", "text/event-stream", "application/x-ndjson")
+
+def _identity_encoding(media_type: str) -> dict:
+    """Headers that keep GZipMiddleware off responses it should not compress"""
+    if media_type.startswith(UNCOMPRESSED_MEDIA_TYPES):
+        return {"Content-Encoding": "identity"}
+    return {}
+
 # Service endpoints (adjust ports as needed)
 SERVICES = {
     "fastwhisper": "http://localhost:8008",
@@ -33,13 +141,24 @@ SERVICES = {
     "qwen_tts": "http://localhost:9001"  # Qwen3-TTS API wrapper
 }
 
+# Fully-formed upstream URLs, built once at import
+UPSTREAMS = {
+    "fastwhisper_transcribe": f"{SERVICES['fastwhisper']}/v1/transcriptions",
+    "ollama_generate": f"{SERVICES['ollama']}/api/generate",
+    "ollama_chat": f"{SERVICES['ollama']}/api/chat",
+    "qwen_ocr": f"{SERVICES['qwen_ocr']}/ocr",
+    "tts_voice_clone": f"{SERVICES['qwen_tts']}/api/voice-clone",
+    "tts_voice_design": f"{SERVICES['qwen_tts']}/api/voice-design",
+    "tts_custom_voice": f"{SERVICES['qwen_tts']}/api/custom-voice",
+    "tts_info": f"{SERVICES['qwen_tts']}/api/info",
+    "tts_load_model": f"{SERVICES['qwen_tts']}/api/load-model",
+    "whisperlive": SERVICES['whisperlive'],
+}
+
 # ============= Pydantic Models for TTS =============
 
-class TTSVoiceCloneRequest(BaseModel):
-    text: str
-    language: Optional[str] = "Auto"
-    ref_text: Optional[str] = None
-    x_vector_only: bool = False
+class TTSGenerationParams(BaseModel):
+    """Sampling parameters shared by every TTS request"""
     max_new_tokens: Optional[int] = 2048
     temperature: Optional[float] = 0.9
     top_k: Optional[int] = 50
@@ -51,43 +170,274 @@ class TTSVoiceCloneRequest(BaseModel):
     subtalker_top_k: Optional[int] = 50
     subtalker_top_p: Optional[float] = 1.0
 
-class TTSVoiceDesignRequest(BaseModel):
+class TTSVoiceCloneRequest(TTSGenerationParams):
+    text: str
+    language: Optional[str] = "Auto"
+    ref_text: Optional[str] = None
+    x_vector_only: bool = False
+
+class TTSVoiceDesignRequest(TTSGenerationParams):
     text: str
     language: Optional[str] = "Auto"
     instruct: str  # Voice design instruction
-    max_new_tokens: Optional[int] = 2048
-    temperature: Optional[float] = 0.9
-    top_k: Optional[int] = 50
-    top_p: Optional[float] = 1.0
-    repetition_penalty: Optional[float] = 1.05
-    do_sample: bool = True
-    subtalker_dosample: bool = True
-    subtalker_temperature: Optional[float] = 0.9
-    subtalker_top_k: Optional[int] = 50
-    subtalker_top_p: Optional[float] = 1.0
 
-class TTSCustomVoiceRequest(BaseModel):
+class TTSCustomVoiceRequest(TTSGenerationParams):
     text: str
     language: str = "Auto"
     speaker: str = "Vivian"
     instruct: Optional[str] = None
-    max_new_tokens: Optional[int] = 2048
-    temperature: Optional[float] = 0.9
-    top_k: Optional[int] = 50
-    top_p: Optional[float] = 1.0
-    repetition_penalty: Optional[float] = 1.05
-    do_sample: bool = True
-    subtalker_dosample: bool = True
-    subtalker_temperature: Optional[float] = 0.9
-    subtalker_top_k: Optional[int] = 50
-    subtalker_top_p: Optional[float] = 1.0
+
+# Request bodies below are serialised straight from the model, so they need a content type
+JSON_HEADERS = {"content-type": "application/json"}
+
+# ============= Response Cache =============
+
+# Greedy-decoded TTS / Ollama output is deterministic, so identical requests can
+# be answered without touching the GPU. Bounded by total cached bytes.
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESPONSE_CACHE_TTL = 3600.0
+_response_cache = TTLCache(
+    maxsize=RESPONSE_CACHE_MAX_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+    getsizeof=lambda entry: len(entry[0])
+)
+
+def _cache_key(endpoint: str, body: bytes) -> str:
+    """Hash an endpoint name and serialised request body into a response cache key"""
+    return hashlib.sha256(endpoint.encode() + b"\0" + body).hexdigest()
+
+# Bumped by /tts/load-model; part of every TTS cache key so audio from the previous
+# checkpoint is never served (its entries just age out of the cache)
+_tts_model_epoch = 0
+
+def _tts_cache_key(endpoint: str, body: bytes) -> str:
+    """Cache key for a TTS request, scoped to the currently loaded checkpoint"""
+    return _cache_key(f"{endpoint}@{_tts_model_epoch}", body)
+
+def _is_deterministic_tts(params: TTSGenerationParams) -> bool:
+    """Whether a TTS request decodes greedily in both the talker and the subtalker"""
+    talker = params.do_sample is False or params.temperature == 0
+    subtalker = params.subtalker_dosample is False or params.subtalker_temperature == 0
+    return talker and subtalker
+
+def _cached_response(key: Optional[str], headers: Optional[dict] = None):
+    """Return a stored upstream reply for the key, or None on a miss"""
+    if key is None:
+        return None
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    body, media_type, cached_headers = entry
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={**_identity_encoding(media_type), **cached_headers, **(headers or {})}
+    )
+
+async def _tee_into_cache(key: str, chunks, media_type: str, headers: dict, store: bool = True):
+    """Yield upstream chunks to the client and cache the full body once it completes"""
+    try:
+        parts = []
+        async for chunk in chunks:
+            if store:
+                parts.append(chunk)
+            yield chunk
+        body = b"".join(parts)
+        if store and len(body) <= RESPONSE_CACHE_MAX_BYTES:
+            _response_cache[key] = (body, media_type, headers)
+    finally:
+        _release_inflight(key)
+
+# ============= Request Coalescing =============
+
+# None of the upstream APIs accept batched prompts, so concurrent requests cannot
+# share a forward pass. Identical deterministic requests can still share one
+# upstream call: followers wait for the leader's body to land in the cache.
+COALESCE_TIMEOUT = 300.0
+_inflight: dict = {}
+
+def _release_inflight(key: str):
+    """Wake requests waiting on the in-flight call for this key"""
+    pending = _inflight.pop(key, None)
+    if pending is not None and not pending.done():
+        pending.set_result(None)
+
+async def _coalesce(cache_key: Optional[str], headers: Optional[dict], fetch):
+    """Serve a request from the cache, an identical in-flight call, or upstream via fetch()"""
+    if cache_key is None:
+        return await fetch()
+
+    cached = _cached_response(cache_key, headers)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(cache_key)
+    if pending is not None:
+        await asyncio.wait({pending}, timeout=COALESCE_TIMEOUT)
+        cached = _cached_response(cache_key, headers)
+        if cached is not None:
+            return cached
+        # Leader failed or was cut short; go upstream ourselves
+        return await fetch()
+
+    _inflight[cache_key] = asyncio.get_running_loop().create_future()
+    try:
+        return await fetch()
+    except BaseException:
+        _release_inflight(cache_key)
+        raise
+
+# ============= Upstream Streaming =============
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class _RelayResponse(StreamingResponse):
+    """StreamingResponse over an upstream reply that always cleans up after itself.
+
+    The upstream connection is closed and any coalesced followers are released
+    however sending ends, including client disconnects and bodies that were
+    never iterated, where neither the generator's finally nor background runs.
+    """
+
+    def __init__(self, content, upstream: httpx.Response, cache_key: Optional[str] = None, **kwargs):
+        super().__init__(content, **kwargs)
+        self.upstream = upstream
+        self.cache_key = cache_key
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.cache_key is not None:
+                _release_inflight(self.cache_key)
+            await self.upstream.aclose()
+
+async def _stream_upstream(
+    method: str,
+    url: str,
+    *,
+    media_type: str,
+    response_headers: Optional[dict] = None,
+    cache_key: Optional[str] = None,
+    download: bool = False,
+    **kwargs
+):
+    """Relay an upstream response chunk by chunk instead of buffering it.
+
+    The upstream status is checked before the response starts, so errors
+    still surface as proper HTTP status codes. With a cache_key, a successful
+    body is also stored in the response cache. With download, the body is
+    spooled to disk first and served as a file.
+    """
+    client = app.state.http
+    response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+    if response.status_code != 200:
+        detail = (await response.aread()).decode(errors="replace")
+        await response.aclose()
+        logger.warning("Upstream %s returned %s: %s", url, response.status_code, detail)
+        raise HTTPException(status_code=response.status_code, detail=detail)
+
+    body = response.aiter_bytes(STREAM_CHUNK_SIZE)
+    if cache_key is not None:
+        body = _tee_into_cache(cache_key, body, media_type, {})
+    headers = {**_identity_encoding(media_type), **(response_headers or {})}
+    if download:
+        return await _spool_to_file(body, response, media_type, headers)
+    return _RelayResponse(
+        body,
+        response,
+        cache_key,
+        media_type=media_type,
+        headers=headers
+    )
+
+# Download bodies up to this size are served from memory; larger ones spill to a
+# temp file in batches of this size, written on a worker thread
+SPOOL_MEMORY_MAX = 8 * 1024 * 1024
+
+async def _spool_to_file(chunks, response: httpx.Response, media_type: str, headers: dict):
+    """Drain an upstream body, then serve it from memory or a temp file.
+
+    Frees the upstream connection as soon as generation finishes, however
+    slowly the client downloads. Bodies over SPOOL_MEMORY_MAX spill to disk
+    off the event loop and are served with FileResponse, which lets servers
+    supporting the pathsend extension hand the file to sendfile(2).
+    """
+    parts = []
+    buffered = 0
+    spool = None
+    try:
+        async with aclosing(chunks):
+            async for chunk in chunks:
+                parts.append(chunk)
+                buffered += len(chunk)
+                if buffered >= SPOOL_MEMORY_MAX:
+                    if spool is None:
+                        spool = await asyncio.to_thread(tempfile.NamedTemporaryFile, delete=False)
+                    await asyncio.to_thread(spool.writelines, parts)
+                    parts, buffered = [], 0
+        if spool is not None:
+            await asyncio.to_thread(spool.writelines, parts)
+            await asyncio.to_thread(spool.close)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.unlink(spool.name)
+        raise
+    finally:
+        await response.aclose()
+    if spool is None:
+        return Response(content=b"".join(parts), media_type=media_type, headers=headers)
+    return FileResponse(
+        spool.name,
+        media_type=media_type,
+        headers=headers,
+        background=BackgroundTask(os.unlink, spool.name)
+    )
+
+async def _proxy_raw(request: Request, url: str, *, content=None, cache_key: Optional[str] = None, **kwargs):
+    """Pass a JSON request body through to upstream and relay the reply verbatim.
+
+    Skips FastAPI's parse/validate and re-serialisation round trips; the
+    upstream status code and content type are forwarded as-is. The body is
+    streamed from the client unless already-read content is given.
+    """
+    client = app.state.http
+    upstream_request = client.build_request(
+        "POST",
+        url,
+        content=request.stream() if content is None else content,
+        headers={"content-type": request.headers.get("content-type", "application/json")},
+        **kwargs
+    )
+    response = await client.send(upstream_request, stream=True)
+
+    media_type = response.headers.get("content-type", "application/json")
+    if "content-encoding" in response.headers:
+        headers = {"content-encoding": response.headers["content-encoding"]}
+    else:
+        headers = _identity_encoding(media_type)
+    body = response.aiter_raw()
+    if cache_key is not None:
+        body = _tee_into_cache(cache_key, body, media_type, headers, store=response.status_code == 200)
+    return _RelayResponse(
+        body,
+        response,
+        cache_key,
+        status_code=response.status_code,
+        media_type=media_type,
+        headers=headers
+    )
 
 # ============= Health Check =============
 
+# Static payload, so serialise it once at import
+HEALTH_BODY = orjson.dumps({"status": "healthy", "services": list(SERVICES.keys())})
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "services": list(SERVICES.keys())}
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 # ============= FastWhisper Endpoints =============
 
@@ -99,81 +449,64 @@ async def transcribe(
     stream: Optional[bool] = Form(False)
 ):
     """Proxy to FastWhisper API"""
-    try:
-        files = {"file": (file.filename, await file.read(), file.content_type)}
-        data = {"model": model}
-        if language:
-            data["language"] = language
-        
-        params = {"stream": "true"} if stream else {}
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['fastwhisper']}/v1/transcriptions",
-                files=files,
-                data=data,
-                params=params
-            )
-            
-            if stream:
-                return StreamingResponse(
-                    response.iter_bytes(),
-                    media_type="text/event-stream"
-                )
-            
-            return response.json()
-            
-    except Exception as e:
-        logger.error(f"FastWhisper error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    files = {"file": (file.filename, file.file, file.content_type)}
+    data = {"model": model}
+    if language:
+        data["language"] = language
+    
+    params = {"stream": "true"} if stream else {}
+    
+    return await _stream_upstream(
+        "POST",
+        UPSTREAMS['fastwhisper_transcribe'],
+        media_type="text/event-stream" if stream else "application/json",
+        files=files,
+        data=data,
+        params=params
+    )
 
 # ============= Ollama Endpoints =============
 
 @app.post("/ollama/api/generate")
-async def ollama_generate(payload: dict):
+async def ollama_generate(request: Request):
     """Proxy to Ollama generate endpoint"""
+    body = await request.body()
+    cache_key = None
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['ollama']}/api/generate",
-                json=payload
-            )
-            return response.json()
-    except Exception as e:
-        logger.error(f"Ollama error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        payload = None
+    # temperature 0 is greedy decoding in Ollama, so the reply is reproducible
+    if isinstance(payload, dict) and (payload.get("options") or {}).get("temperature") == 0:
+        cache_key = _cache_key("ollama_generate", body)
+
+    return await _coalesce(cache_key, None, lambda: _proxy_raw(
+        request,
+        UPSTREAMS['ollama_generate'],
+        content=body,
+        cache_key=cache_key
+    ))
 
 @app.post("/ollama/api/chat")
-async def ollama_chat(payload: dict):
+async def ollama_chat(request: Request):
     """Proxy to Ollama chat endpoint"""
-    try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['ollama']}/api/chat",
-                json=payload
-            )
-            return response.json()
-    except Exception as e:
-        logger.error(f"Ollama error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _proxy_raw(request, UPSTREAMS['ollama_chat'])
 
 # ============= Qwen OCR Endpoints =============
 
 @app.post("/ocr")
 async def qwen_ocr(file: UploadFile = File(...)):
     """Proxy to Qwen OCR"""
-    try:
-        files = {"file": (file.filename, await file.read(), file.content_type)}
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{SERVICES['qwen_ocr']}/ocr",
-                files=files
-            )
-            return response.json()
-    except Exception as e:
-        logger.error(f"OCR error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    files = {"file": (file.filename, file.file, file.content_type)}
+    
+    client = app.state.http
+    response = await client.post(
+        UPSTREAMS['qwen_ocr'],
+        files=files,
+        timeout=60.0
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
 
 # ============= Qwen3-TTS Endpoints =============
 
@@ -188,147 +521,91 @@ async def tts_voice_clone(
     temperature: float = Form(0.9),
     top_k: int = Form(50),
     top_p: float = Form(1.0),
-    repetition_penalty: float = Form(1.05)
+    repetition_penalty: float = Form(1.05),
+    x_download: bool = Header(False)
 ):
     """
     Voice cloning with reference audio (for Base model)
     
     Upload a reference audio file and provide its transcript (unless using x_vector_only mode)
     """
-    try:
-        # Prepare multipart form data
-        files = {
-            'ref_audio': (ref_audio.filename, await ref_audio.read(), ref_audio.content_type)
-        }
-        
-        data = {
-            'text': text,
-            'language': language,
-            'ref_text': ref_text or '',
-            'x_vector_only': x_vector_only,
-            'max_new_tokens': max_new_tokens,
-            'temperature': temperature,
-            'top_k': top_k,
-            'top_p': top_p,
-            'repetition_penalty': repetition_penalty
-        }
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['qwen_tts']}/api/voice-clone",
-                files=files,
-                data=data
-            )
-            
-            if response.status_code == 200:
-                return StreamingResponse(
-                    iter([response.content]),
-                    media_type="audio/wav",
-                    headers={"Content-Disposition": "attachment; filename=voice_clone.wav"}
-                )
-            else:
-                raise HTTPException(status_code=response.status_code, detail=response.text)
-                
-    except Exception as e:
-        logger.error(f"TTS Voice Clone error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Prepare multipart form data (file object, so httpx streams it in chunks)
+    files = {
+        'ref_audio': (ref_audio.filename, ref_audio.file, ref_audio.content_type)
+    }
+    
+    data = {
+        'text': text,
+        'language': language,
+        'ref_text': ref_text or '',
+        'x_vector_only': x_vector_only,
+        'max_new_tokens': max_new_tokens,
+        'temperature': temperature,
+        'top_k': top_k,
+        'top_p': top_p,
+        'repetition_penalty': repetition_penalty
+    }
+    
+    return await _stream_upstream(
+        "POST",
+        UPSTREAMS['tts_voice_clone'],
+        media_type="audio/wav",
+        response_headers={"Content-Disposition": "attachment; filename=voice_clone.wav"},
+        download=x_download,
+        files=files,
+        data=data
+    )
 
 @app.post("/tts/voice-design")
-async def tts_voice_design(request: TTSVoiceDesignRequest):
+async def tts_voice_design(request: TTSVoiceDesignRequest, x_download: bool = Header(False)):
     """
     Generate speech with voice design description (for VoiceDesign model)
     
     Describe the desired voice characteristics in detail
     """
-    try:
-        payload = {
-            "text": request.text,
-            "language": request.language,
-            "instruct": request.instruct,
-            "max_new_tokens": request.max_new_tokens,
-            "temperature": request.temperature,
-            "top_k": request.top_k,
-            "top_p": request.top_p,
-            "repetition_penalty": request.repetition_penalty,
-            "do_sample": request.do_sample,
-            "subtalker_dosample": request.subtalker_dosample,
-            "subtalker_temperature": request.subtalker_temperature,
-            "subtalker_top_k": request.subtalker_top_k,
-            "subtalker_top_p": request.subtalker_top_p
-        }
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['qwen_tts']}/api/voice-design",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                return StreamingResponse(
-                    iter([response.content]),
-                    media_type="audio/wav",
-                    headers={"Content-Disposition": "attachment; filename=voice_design.wav"}
-                )
-            else:
-                logger.error(f"TTS API error: {response.status_code} - {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=response.text)
-                
-    except httpx.TimeoutException:
-        logger.error("TTS request timeout")
-        raise HTTPException(status_code=504, detail="TTS generation timeout")
-    except Exception as e:
-        logger.error(f"TTS Voice Design error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    body = request.model_dump_json().encode()
+    headers = {"Content-Disposition": "attachment; filename=voice_design.wav"}
+    cache_key = _tts_cache_key("voice-design", body) if _is_deterministic_tts(request) else None
+
+    return await _coalesce(cache_key, headers, lambda: _stream_upstream(
+        "POST",
+        UPSTREAMS['tts_voice_design'],
+        media_type="audio/wav",
+        response_headers=headers,
+        cache_key=cache_key,
+        download=x_download,
+        content=body,
+        headers=JSON_HEADERS
+    ))
 
 @app.post("/tts/custom-voice")
-async def tts_custom_voice(request: TTSCustomVoiceRequest):
+async def tts_custom_voice(request: TTSCustomVoiceRequest, x_download: bool = Header(False)):
     """
     Generate speech with preset speakers and emotion control (for CustomVoice model)
     
     Available speakers: Vivian, Ryan, etc.
     Use 'instruct' field for emotion/style: "very happy", "angry tone", etc.
     """
-    try:
-        payload = {
-            "text": request.text,
-            "language": request.language,
-            "speaker": request.speaker,
-            "instruct": request.instruct,
-            "max_new_tokens": request.max_new_tokens,
-            "temperature": request.temperature,
-            "top_k": request.top_k,
-            "top_p": request.top_p,
-            "repetition_penalty": request.repetition_penalty,
-            "do_sample": request.do_sample,
-            "subtalker_dosample": request.subtalker_dosample,
-            "subtalker_temperature": request.subtalker_temperature,
-            "subtalker_top_k": request.subtalker_top_k,
-            "subtalker_top_p": request.subtalker_top_p
-        }
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['qwen_tts']}/api/custom-voice",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                return StreamingResponse(
-                    iter([response.content]),
-                    media_type="audio/wav",
-                    headers={"Content-Disposition": "attachment; filename=custom_voice.wav"}
-                )
-            else:
-                raise HTTPException(status_code=response.status_code, detail=response.text)
-                
-    except Exception as e:
-        logger.error(f"TTS Custom Voice error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    body = request.model_dump_json().encode()
+    headers = {"Content-Disposition": "attachment; filename=custom_voice.wav"}
+    cache_key = _tts_cache_key("custom-voice", body) if _is_deterministic_tts(request) else None
+
+    return await _coalesce(cache_key, headers, lambda: _stream_upstream(
+        "POST",
+        UPSTREAMS['tts_custom_voice'],
+        media_type="audio/wav",
+        response_headers=headers,
+        cache_key=cache_key,
+        download=x_download,
+        content=body,
+        headers=JSON_HEADERS
+    ))
 
 @app.post("/tts/simple")
 async def tts_simple(
     text: str = Form(...),
-    voice_description: Optional[str] = Form("Professional female voice, clear and articulate")
+    voice_description: Optional[str] = Form("Professional female voice, clear and articulate"),
+    x_download: bool = Header(False)
 ):
     """
     Simplified TTS endpoint - just text and voice description
@@ -338,51 +615,30 @@ async def tts_simple(
     - "Deep authoritative male voice, slow and deliberate"
     - "Friendly conversational tone, middle-aged woman"
     """
-    try:
-        payload = {
-            "text": text,
-            "language": "Auto",
-            "instruct": voice_description,
-            "max_new_tokens": 2048,
-            "temperature": 0.9,
-            "top_k": 50,
-            "top_p": 1.0,
-            "repetition_penalty": 1.05,
-            "do_sample": True,
-            "subtalker_dosample": True,
-            "subtalker_temperature": 0.9,
-            "subtalker_top_k": 50,
-            "subtalker_top_p": 1.0
-        }
-        
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{SERVICES['qwen_tts']}/api/voice-design",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                return StreamingResponse(
-                    iter([response.content]),
-                    media_type="audio/wav",
-                    headers={"Content-Disposition": "attachment; filename=speech.wav"}
-                )
-            else:
-                logger.error(f"TTS API returned {response.status_code}: {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=response.text)
-                
-    except httpx.TimeoutException:
-        logger.error("TTS request timeout")
-        raise HTTPException(status_code=504, detail="TTS generation timeout - text may be too long")
-    except Exception as e:
-        logger.error(f"TTS Simple error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    request = TTSVoiceDesignRequest(text=text, instruct=voice_description)
+    
+    return await _stream_upstream(
+        "POST",
+        UPSTREAMS['tts_voice_design'],
+        media_type="audio/wav",
+        response_headers={"Content-Disposition": "attachment; filename=speech.wav"},
+        download=x_download,
+        content=request.model_dump_json().encode(),
+        headers=JSON_HEADERS
+    )
 
 # ============= TTS Info Endpoint =============
 
-@app.get("/tts/info")
-async def tts_info():
-    """Get information about available TTS models and capabilities"""
+# Upstream model info only changes on model reload; /tts/load-model clears it
+TTS_INFO_TTL = 30.0
+_tts_info_cache = TTLCache(maxsize=8, ttl=TTS_INFO_TTL)
+_tts_info_lock = asyncio.Lock()
+
+async def _fetch_tts_info():
+    """Build the TTS info payload, merged with the upstream's current model details.
+
+    Returns the payload and whether the upstream lookup succeeded.
+    """
     base_info = {
         "service": "Qwen3-TTS",
         "models": {
@@ -423,91 +679,163 @@ async def tts_info():
         "supported_languages": ["Auto", "English", "Chinese", "Japanese", "Korean", "Spanish", "French", "German"]
     }
 
+    fresh = False
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(f"{SERVICES['qwen_tts']}/api/info")
-            if response.status_code == 200:
-                upstream = response.json()
-                base_info["current_model_type"] = upstream.get("model_type")
-                base_info["current_model_checkpoint"] = upstream.get("model_checkpoint")
-                if upstream.get("supported_languages"):
-                    base_info["supported_languages"] = upstream.get("supported_languages")
-                if upstream.get("supported_speakers"):
-                    base_info["models"]["custom_voice"]["available_speakers"] = upstream.get("supported_speakers")
-    except Exception as e:
-        logger.error(f"TTS info upstream error: {e}")
+        client = app.state.http
+        response = await client.get(UPSTREAMS['tts_info'], timeout=30.0)
+        if response.status_code == 200:
+            fresh = True
+            upstream = orjson.loads(response.content)
+            base_info["current_model_type"] = upstream.get("model_type")
+            base_info["current_model_checkpoint"] = upstream.get("model_checkpoint")
+            if upstream.get("supported_languages"):
+                base_info["supported_languages"] = upstream.get("supported_languages")
+            if upstream.get("supported_speakers"):
+                base_info["models"]["custom_voice"]["available_speakers"] = upstream.get("supported_speakers")
+    except (httpx.RequestError, orjson.JSONDecodeError) as e:
+        # Info still works without the upstream; it just lacks the current model details
+        logger.warning("TTS info upstream error: %s", e)
 
-    return base_info
+    return base_info, fresh
+
+@app.get("/tts/info")
+async def tts_info():
+    """Get information about available TTS models and capabilities"""
+    info = _tts_info_cache.get("info")
+    if info is not None:
+        return info
+
+    # Only one request refreshes the cache; the rest wait and reuse its result
+    async with _tts_info_lock:
+        info = _tts_info_cache.get("info")
+        if info is None:
+            info, fresh = await _fetch_tts_info()
+            if fresh:
+                _tts_info_cache["info"] = info
+    return info
 
 @app.post("/tts/load-model")
-async def tts_load_model(payload: dict):
+async def tts_load_model(request: Request):
     """Load a different Qwen3-TTS model checkpoint."""
+    global _tts_model_epoch
     try:
-        async with httpx.AsyncClient(timeout=600.0) as client:
-            response = await client.post(
-                f"{SERVICES['qwen_tts']}/api/load-model",
-                json=payload
-            )
-            if response.status_code == 200:
-                return response.json()
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=504, detail="Model load timeout")
-    except Exception as e:
-        logger.error(f"TTS load model error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        return await _proxy_raw(request, UPSTREAMS['tts_load_model'], timeout=600.0)
+    finally:
+        # Upstream drops the current model even when the load fails, so cached info is stale either way
+        _tts_info_cache.clear()
+        # New keys for cached and in-flight TTS audio, so followers don't join an old-model call
+        _tts_model_epoch += 1
 
 # ============= WhisperLive WebSocket =============
 
+# Frames buffered per direction before the reading side waits on the writer
+WS_QUEUE_SIZE = 32
+WS_MAX_BATCH = 16
+# WhisperLive's end-of-stream marker arrives as a binary frame and must stay on its own
+END_OF_AUDIO = b"END_OF_AUDIO"
+
+class _BackendClosed(Exception):
+    """WhisperLive ended the session"""
+
+# Queued behind WhisperLive's last message, so the client writer flushes everything first
+_BACKEND_EOF = object()
+
+def _drain(queue: asyncio.Queue, first) -> list:
+    """Collect the frames already waiting behind `first` without yielding"""
+    batch = [first]
+    while len(batch) < WS_MAX_BATCH and not queue.empty():
+        batch.append(queue.get_nowait())
+    return batch
+
+def _join_audio(batch: list) -> list:
+    """Merge consecutive PCM frames; WhisperLive appends audio bytes to one buffer"""
+    frames, pcm = [], []
+    for frame in batch:
+        if isinstance(frame, bytes) and frame != END_OF_AUDIO:
+            pcm.append(frame)
+            continue
+        if pcm:
+            frames.append(b"".join(pcm))
+            pcm = []
+        frames.append(frame)
+    if pcm:
+        frames.append(b"".join(pcm))
+    return frames
+
 @app.websocket("/ws/whisperlive")
 async def whisperlive_websocket(websocket: WebSocket):
     """Proxy WebSocket connections to WhisperLive"""
     await websocket.accept()
     
-    whisperlive_url = SERVICES['whisperlive'].replace('ws://', 'ws://')
-    
     try:
-        async with websockets.connect(whisperlive_url) as ws_backend:
-            async def forward_to_backend():
-                try:
-                    while True:
-                        data = await websocket.receive()
-                        if "text" in data:
-                            await ws_backend.send(data["text"])
-                        elif "bytes" in data:
-                            await ws_backend.send(data["bytes"])
-                except WebSocketDisconnect:
-                    logger.info("Client disconnected")
-                except Exception as e:
-                    logger.error(f"Error forwarding to backend: {e}")
-            
-            async def forward_to_client():
+        async with websockets.connect(UPSTREAMS['whisperlive']) as ws_backend:
+            # Bounded queues decouple reads from writes in each direction while
+            # applying back-pressure when one peer stalls
+            to_backend = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+            to_client = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+
+            async def read_client():
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(message.get("code", 1000))
+                    data = message.get("bytes")
+                    await to_backend.put(data if data is not None else message.get("text"))
+
+            async def write_backend():
+                while True:
+                    batch = _drain(to_backend, await to_backend.get())
+                    for frame in _join_audio(batch):
+                        await ws_backend.send(frame)
+
+            async def read_backend():
                 try:
                     async for message in ws_backend:
+                        await to_client.put(message)
+                except websockets.ConnectionClosed:
+                    pass
+                # write_client ends the session once it reaches this, not before
+                await to_client.put(_BACKEND_EOF)
+
+            async def write_client():
+                while True:
+                    # Transcript frames are separate JSON documents, so drain but never merge
+                    for message in _drain(to_client, await to_client.get()):
+                        if message is _BACKEND_EOF:
+                            raise _BackendClosed()
                         if isinstance(message, str):
                             await websocket.send_text(message)
                         else:
                             await websocket.send_bytes(message)
-                except WebSocketDisconnect:
-                    logger.info("Client disconnected")
-                except Exception as e:
-                    logger.error(f"Error forwarding to client: {e}")
-            
-            await asyncio.gather(
-                forward_to_backend(),
-                forward_to_client(),
-                return_exceptions=True
-            )
+
+            # Whichever side finishes or fails first cancels the others
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(read_client())
+                    tg.create_task(write_backend())
+                    tg.create_task(read_backend())
+                    tg.create_task(write_client())
+            except* WebSocketDisconnect:
+                logger.info("Client disconnected")
+            except* (_BackendClosed, websockets.ConnectionClosed):
+                logger.info("WhisperLive connection closed")
             
     except Exception as e:
-        logger.error(f"WhisperLive WebSocket error: {e}")
+        logger.error("WhisperLive WebSocket error: %s", e)
         await websocket.close(code=1011, reason=str(e))
 
 if __name__ == "__main__":
+    import importlib.util
     import uvicorn
     uvicorn.run(
-        app,
+        "gateway:app",
         host="127.0.0.1",
         port=9072,
+        # Cython event loop and HTTP parser when installed
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        # Response cache and request coalescing live in-process, so extra workers each
+        # keep their own copy; raise this only when throughput matters more than hit rate
+        workers=int(os.environ.get("GATEWAY_WORKERS", "1")),
         log_level="info"
     )
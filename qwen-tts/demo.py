@@ -17,49 +17,181 @@
 Enhanced gradio demo for Qwen3 TTS models with full parameter control.
 """
 
+from __future__ import annotations
+
 import argparse
 import gc
+import hashlib
+import importlib
+import json
 import os
 import tempfile
 import threading
-from contextlib import contextmanager
-from dataclasses import asdict
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
-import gradio as gr
 import numpy as np
-import torch
 
-from .. import Qwen3TTSModel, VoiceClonePromptItem
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# gradio, torch and the model package are imported where first needed, so --help and
+# argument errors return without paying for them
+if TYPE_CHECKING:
+    import gradio as gr
+    import torch
+
+    from .. import Qwen3TTSModel
 
 
+@lru_cache(maxsize=1024)
 def _title_case_display(s: str) -> str:
     s = (s or "").strip()
     s = s.replace("_", " ")
     return " ".join([w[:1].upper() + w[1:] if w else "" for w in s.split()])
 
 
-def _build_choices_and_map(items: Optional[List[str]]) -> Tuple[List[str], Dict[str, str]]:
+# Memoized per checkpoint's item list; the returned mapping is shared, so treat it as read-only
+@lru_cache(maxsize=32)
+def _build_choices_and_map(items: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Dict[str, str]]:
     if not items:
-        return [], {}
-    display = [_title_case_display(x) for x in items]
+        return (), {}
+    display = tuple(_title_case_display(x) for x in items)
     mapping = {d: r for d, r in zip(display, items)}
     return display, mapping
 
 
+# Names of torch dtype attributes, resolved lazily so this table doesn't need torch
+_DTYPE_MAP: Dict[str, str] = {
+    "bf16": "bfloat16",
+    "bfloat16": "bfloat16",
+    "fp16": "float16",
+    "float16": "float16",
+    "half": "float16",
+    "fp32": "float32",
+    "float32": "float32",
+}
+
+
 def _dtype_from_str(s: str) -> torch.dtype:
     s = (s or "").strip().lower()
-    if s in ("bf16", "bfloat16"):
-        return torch.bfloat16
-    if s in ("fp16", "float16", "half"):
-        return torch.float16
-    if s in ("fp32", "float32"):
-        return torch.float32
-    raise ValueError(f"Unsupported torch dtype: {s}. Use bfloat16/float16/float32.")
+    try:
+        name = _DTYPE_MAP[s]
+    except KeyError:
+        raise ValueError(f"Unsupported torch dtype: {s}. Use bfloat16/float16/float32.") from None
+    import torch
+
+    return getattr(torch, name)
+
+
+QUANT_CHOICES = ("none", "int8_wo", "int4_nf4", "fp8_wo")
+JIT_VOCODER_CHOICES = ("none", "compile", "script")
+# Where the codec decoder that turns audio tokens into waveform may live, relative to tts.model
+_VOCODER_PATHS = ("vocoder", "speech_tokenizer.model.decoder", "speech_tokenizer.decoder")
+
+
+def _find_vocoder(tts: Qwen3TTSModel) -> Optional[Tuple[Any, str, torch.nn.Module]]:
+    import torch
+
+    for path in _VOCODER_PATHS:
+        *parents, name = path.split(".")
+        owner = tts.model
+        for attr in parents:
+            owner = getattr(owner, attr, None)
+            if owner is None:
+                break
+        module = getattr(owner, name, None) if owner is not None else None
+        if isinstance(module, torch.nn.Module):
+            return owner, name, module
+    return None
+
+
+def _jit_vocoder(tts: Qwen3TTSModel, device: str, mode: str) -> None:
+    if mode == "none":
+        return
+    import torch
+
+    # CUDA-graph-backed reduce-overhead mode only pays off on GPU; script is the CPU option
+    if mode == "compile" and (not str(device).startswith("cuda") or not hasattr(torch, "compile")):
+        return
+    found = _find_vocoder(tts)
+    if found is None:
+        print("Vocoder JIT skipped: decoder module not found.")
+        return
+    owner, name, module = found
+    try:
+        if mode == "script":
+            compiled = torch.jit.script(module)
+        else:
+            compiled = torch.compile(module, mode="reduce-overhead", fullgraph=False)
+    except Exception as e:
+        print(f"Vocoder JIT skipped: {type(e).__name__}: {e}")
+        return
+    setattr(owner, name, compiled)
+
+
+def _load_tts(
+    ckpt: str,
+    device: str,
+    dtype: torch.dtype,
+    attn_impl: Optional[str],
+    quant: str = "none",
+    jit_vocoder: str = "none",
+) -> Qwen3TTSModel:
+    quant = (quant or "none").strip().lower()
+    if quant not in QUANT_CHOICES:
+        raise ValueError(f"Unsupported quantization: {quant}. Use {'/'.join(QUANT_CHOICES)}.")
+
+    load_kwargs: Dict[str, Any] = {}
+    if quant == "int4_nf4":
+        from transformers import BitsAndBytesConfig
+
+        load_kwargs["quantization_config"] = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=dtype,
+        )
+
+    from .. import Qwen3TTSModel
+
+    tts = Qwen3TTSModel.from_pretrained(
+        ckpt,
+        device_map=device,
+        dtype=dtype,
+        attn_implementation=attn_impl,
+        **load_kwargs,
+    )
+
+    if quant in ("int8_wo", "fp8_wo"):
+        from torchao.quantization import quantize_
+
+        try:
+            from torchao.quantization import Float8WeightOnlyConfig, Int8WeightOnlyConfig
+
+            config = Int8WeightOnlyConfig() if quant == "int8_wo" else Float8WeightOnlyConfig()
+        except ImportError:
+            from torchao.quantization import float8_weight_only, int8_weight_only
+
+            config = int8_weight_only() if quant == "int8_wo" else float8_weight_only()
+        # Only the talker LM is bandwidth-bound at decode; keep the codec in full precision
+        quantize_(getattr(tts.model, "talker", tts.model), config)
+
+    # Compilation itself happens lazily, in the warmup generation that follows a load
+    _jit_vocoder(tts, device, jit_vocoder)
+    return tts
 
 
 def _maybe(v):
-    return v if v is not None else gr.update()
+    if v is not None:
+        return v
+    import gradio as gr
+
+    return gr.update()
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -103,6 +235,24 @@ def build_parser() -> argparse.ArgumentParser:
         choices=["bfloat16", "bf16", "float16", "fp16", "float32", "fp32"],
         help="Torch dtype for loading the model (default: bfloat16).",
     )
+    parser.add_argument(
+        "--quant",
+        default="none",
+        choices=QUANT_CHOICES,
+        help=(
+            "Weight quantization for the talker (default: none). int4_nf4 loads through bitsandbytes;\n"
+            "int8_wo / fp8_wo apply torchao weight-only quantization after loading."
+        ),
+    )
+    parser.add_argument(
+        "--jit-vocoder",
+        default="none",
+        choices=JIT_VOCODER_CHOICES,
+        help=(
+            "Compile the codec decoder: torch.compile reduce-overhead with CUDA graphs (CUDA only),\n"
+            "torch.jit.script (CPU deployments), or none (default: none)."
+        ),
+    )
     parser.add_argument(
         "--flash-attn/--no-flash-attn",
         dest="flash_attn",
@@ -136,6 +286,18 @@ def build_parser() -> argparse.ArgumentParser:
         default=16,
         help="Gradio queue concurrency (default: 16).",
     )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=4,
+        help="Max concurrent requests merged into one generate call; 1 disables batching (default: 4).",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=30.0,
+        help="How long a request waits for others to batch with (default: 30).",
+    )
 
     # HTTPS args
     parser.add_argument(
@@ -192,58 +354,169 @@ def _collect_gen_kwargs(args: argparse.Namespace) -> Dict[str, Any]:
     return {k: v for k, v in mapping.items() if v is not None}
 
 
+# Below this many samples the NumPy passes are cheaper than the parallel kernel launch
+_NUMBA_MIN_SAMPLES = 1 << 16
+_NUMBA_WARMED = False
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _max_abs_kernel(x):
+        n, nch = x.shape
+        nblocks = 64
+        step = (n + nblocks - 1) // nblocks
+        partial = np.zeros(nblocks, dtype=np.float32)
+        for b in prange(nblocks):
+            m = np.float32(0.0)
+            for i in range(b * step, min(n, (b + 1) * step)):
+                for c in range(nch):
+                    v = abs(np.float32(x[i, c]))
+                    if v > m:
+                        m = v
+            partial[b] = m
+        return partial.max()
+
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _scale_downmix_kernel(x, offset, scale, clip):
+        n, nch = x.shape
+        inv_nch = np.float32(1.0 / nch)
+        y = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for c in range(nch):
+                v = (np.float32(x[i, c]) - offset) * scale
+                if clip:
+                    v = min(max(v, np.float32(-1.0)), np.float32(1.0))
+                acc += v
+            y[i] = acc * inv_nch
+        return y
+
+
+def _warm_numba_kernels() -> None:
+    global _NUMBA_WARMED
+    if njit is None or _NUMBA_WARMED:
+        return
+    _NUMBA_WARMED = True
+
+    def _compile():
+        for dtype in (np.int16, np.float32):
+            x = np.zeros((8, 2), dtype=dtype)
+            _max_abs_kernel(x)
+            _scale_downmix_kernel(x, np.float32(0.0), np.float32(1.0), True)
+
+    threading.Thread(target=_compile, name="numba-warmup", daemon=True).start()
+
+
+def _normalize_audio_fused(x: np.ndarray, eps: float, clip: bool) -> np.ndarray:
+    """Scan, scale, clip and downmix in one or two parallel passes over the buffer."""
+    x2 = x if x.ndim == 2 else x.reshape(-1, 1)
+
+    if np.issubdtype(x.dtype, np.integer):
+        info = np.iinfo(x.dtype)
+        if info.min < 0:
+            offset, scale = 0.0, 1.0 / max(abs(info.min), info.max)
+        else:
+            mid = (info.max + 1) / 2.0
+            offset, scale = mid, 1.0 / mid
+        needs_clip = False
+    else:
+        m = _max_abs_kernel(x2)
+        offset, scale = 0.0, (1.0 if m <= 1.0 + 1e-6 else 1.0 / (m + eps))
+        # Multiplying by a rounded reciprocal can overshoot 1.0 by an ulp
+        needs_clip = m > 1.0
+
+    return _scale_downmix_kernel(x2, np.float32(offset), np.float32(scale), clip and needs_clip)
+
+
 def _normalize_audio(wav, eps=1e-12, clip=True):
     x = np.asarray(wav)
 
+    if (
+        njit is not None
+        and x.ndim in (1, 2)
+        and x.size >= _NUMBA_MIN_SAMPLES
+        and x.dtype.kind in "iuf"
+        and x.dtype != np.float16
+    ):
+        return _normalize_audio_fused(x, eps, clip)
+
     if np.issubdtype(x.dtype, np.integer):
         info = np.iinfo(x.dtype)
+        # Cast and scale in one pass straight into a float32 buffer
+        y = np.empty(x.shape, dtype=np.float32)
 
         if info.min < 0:
-            y = x.astype(np.float32) / max(abs(info.min), info.max)
+            inv = np.float32(1.0 / max(abs(info.min), info.max))
+            np.multiply(x, inv, out=y, dtype=np.float32, casting="unsafe")
         else:
             mid = (info.max + 1) / 2.0
-            y = (x.astype(np.float32) - mid) / mid
+            np.subtract(x, np.float32(mid), out=y, dtype=np.float32, casting="unsafe")
+            np.multiply(y, np.float32(1.0 / mid), out=y)
+
+        # The scale is the type's full range, so results already sit in [-1, 1]
+        needs_clip = False
 
     elif np.issubdtype(x.dtype, np.floating):
         y = x.astype(np.float32)
         m = np.max(np.abs(y)) if y.size else 0.0
 
         if m <= 1.0 + 1e-6:
-            pass
+            # Left unscaled, so anything in the (1.0, 1.0 + 1e-6] slack still needs clamping
+            needs_clip = m > 1.0
         else:
             y = y / (m + eps)
+            needs_clip = False
     else:
         raise TypeError(f"Unsupported dtype: {x.dtype}")
 
-    if clip:
-        y = np.clip(y, -1.0, 1.0)
-    
+    if clip and needs_clip:
+        np.clip(y, -1.0, 1.0, out=y)
+
     if y.ndim > 1:
-        y = np.mean(y, axis=-1).astype(np.float32)
+        # Sum channels with a float32 accumulator and scale in place, no float64 temporary
+        nch = y.shape[-1]
+        y = np.add.reduce(y, axis=-1, dtype=np.float32)
+        y *= np.float32(1.0 / nch)
 
     return y
 
 
+def _pcm16_view(data: Any, channels: int = 1) -> Any:
+    # Raw int16 PCM bytes become a zero-copy view; arrays pass through untouched
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    arr = np.frombuffer(data, dtype=np.int16)
+    if channels > 1:
+        arr = arr.reshape(-1, channels)
+    return arr
+
+
 def _audio_to_tuple(audio: Any) -> Optional[Tuple[np.ndarray, int]]:
     if audio is None:
         return None
 
     if isinstance(audio, tuple) and len(audio) == 2 and isinstance(audio[0], int):
         sr, wav = audio
-        wav = _normalize_audio(wav)
+        wav = _normalize_audio(_pcm16_view(wav))
         return wav, int(sr)
 
     if isinstance(audio, dict) and "sampling_rate" in audio and "data" in audio:
         sr = int(audio["sampling_rate"])
-        wav = _normalize_audio(audio["data"])
+        wav = _normalize_audio(_pcm16_view(audio["data"], int(audio.get("channels") or 1)))
         return wav, sr
 
     return None
 
 
-def _wav_to_gradio_audio(wav: np.ndarray, sr: int) -> Tuple[int, np.ndarray]:
-    wav = np.asarray(wav, dtype=np.float32)
-    return sr, wav
+def _wav_to_gradio_audio(wav: Any, sr: int) -> Tuple[int, np.ndarray]:
+    import torch
+
+    if isinstance(wav, torch.Tensor):
+        # Single device + dtype hop rather than numpy() and a second upcast copy
+        wav = wav.detach().to("cpu", dtype=torch.float32).numpy()
+    if isinstance(wav, np.ndarray) and wav.dtype == np.float32 and wav.flags.c_contiguous:
+        return sr, wav
+    return sr, np.ascontiguousarray(wav, dtype=np.float32)
 
 
 def _detect_model_kind(ckpt: str, tts: Qwen3TTSModel) -> str:
@@ -254,28 +527,53 @@ def _detect_model_kind(ckpt: str, tts: Qwen3TTSModel) -> str:
         raise ValueError(f"Unknown Qwen-TTS model type: {mt}")
 
 
-MODEL_PRESETS = [
+MODEL_PRESETS = (
     "Qwen/Qwen3-TTS-12Hz-1.7B-VoiceDesign",
     "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
     "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
-]
+)
 
 _STATE_LOCK = threading.Lock()
-_STATE_COND = threading.Condition(_STATE_LOCK)
+# Set while no reload is in progress; jobs block on it instead of a shared condition
+_RELOAD_EVENT = threading.Event()
+_RELOAD_EVENT.set()
+# Set while no job holds the model; only the job that drains the count signals it
+_IDLE_EVENT = threading.Event()
+_IDLE_EVENT.set()
+# Seconds a reload waits for running jobs to finish before giving up
+_RELOAD_DRAIN_TIMEOUT = float(os.environ.get("QWEN_TTS_RELOAD_TIMEOUT", "300"))
 _MODEL_STATE: Dict[str, Any] = {
-    "tts": None,
-    "ckpt": "",
-    "model_kind": "",
-    "lang_choices_disp": [],
-    "lang_choices_ui": [],
-    "lang_map": {},
-    "spk_choices_disp": [],
-    "spk_map": {},
     "active_jobs": 0,
     "reloading": False,
 }
 
 
+@dataclass(frozen=True, slots=True)
+class ModelSnapshot:
+    tts: Optional[Qwen3TTSModel]
+    ckpt: str
+    model_kind: str
+    lang_choices_disp: List[str]
+    lang_choices_ui: List[str]
+    lang_map: Dict[str, str]
+    spk_choices_disp: List[str]
+    spk_map: Dict[str, str]
+
+
+_EMPTY_SNAPSHOT = ModelSnapshot(
+    tts=None,
+    ckpt="",
+    model_kind="",
+    lang_choices_disp=[],
+    lang_choices_ui=[],
+    lang_map={},
+    spk_choices_disp=[],
+    spk_map={},
+)
+# Swapped as a whole on reload; readers take the reference and never see a half-updated model
+_SNAPSHOT: ModelSnapshot = _EMPTY_SNAPSHOT
+
+
 def _default_lang_value(choices: List[str]) -> Optional[str]:
     if "Auto" in choices:
         return "Auto"
@@ -325,7 +623,7 @@ def _format_model_info(lang_choices_disp: List[str], spk_choices_disp: List[str]
     )
 
 
-def _build_model_state(tts: Qwen3TTSModel, ckpt: str) -> Dict[str, Any]:
+def _build_model_state(tts: Qwen3TTSModel, ckpt: str) -> ModelSnapshot:
     model_kind = _detect_model_kind(ckpt, tts)
 
     supported_langs_raw = None
@@ -336,59 +634,319 @@ def _build_model_state(tts: Qwen3TTSModel, ckpt: str) -> Dict[str, Any]:
     if callable(getattr(tts.model, "get_supported_speakers", None)):
         supported_spks_raw = tts.model.get_supported_speakers()
 
-    lang_choices_disp, lang_map = _build_choices_and_map([x for x in (supported_langs_raw or [])])
-    spk_choices_disp, spk_map = _build_choices_and_map([x for x in (supported_spks_raw or [])])
+    lang_choices_disp, lang_map = _build_choices_and_map(tuple(supported_langs_raw or ()))
+    spk_choices_disp, spk_map = _build_choices_and_map(tuple(supported_spks_raw or ()))
+    lang_choices_disp = list(lang_choices_disp)
+    spk_choices_disp = list(spk_choices_disp)
 
     lang_choices_ui = lang_choices_disp[:]
     if "Auto" not in lang_choices_ui:
         lang_choices_ui.insert(0, "Auto")
     lang_map = {"Auto": "Auto", **lang_map}
 
-    return {
-        "tts": tts,
-        "ckpt": ckpt,
-        "model_kind": model_kind,
-        "lang_choices_disp": lang_choices_disp,
-        "lang_choices_ui": lang_choices_ui,
-        "lang_map": lang_map,
-        "spk_choices_disp": spk_choices_disp,
-        "spk_map": spk_map,
-    }
+    return ModelSnapshot(
+        tts=tts,
+        ckpt=ckpt,
+        model_kind=model_kind,
+        lang_choices_disp=lang_choices_disp,
+        lang_choices_ui=lang_choices_ui,
+        lang_map=lang_map,
+        spk_choices_disp=spk_choices_disp,
+        spk_map=spk_map,
+    )
 
 
-def _set_model_state(state: Dict[str, Any]) -> None:
-    with _STATE_COND:
-        _MODEL_STATE.update(state)
+def _set_model_state(state: ModelSnapshot) -> None:
+    global _SNAPSHOT
+    _SNAPSHOT = state
+
+
+# Cached-but-unused VRAM worth handing back to the driver; below this empty_cache only stalls
+_EMPTY_CACHE_THRESHOLD = 512 * 1024 * 1024
+
+# Autocast dtype for the reference encoder when saving voice profiles: fp16 | bf16 | fp32
+_REF_PRECISION = os.environ.get("QWEN_TTS_REF_PRECISION", "fp16").strip().lower()
+
+
+def _ref_autocast(device: str):
+    import torch
+
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(_REF_PRECISION)
+    if dtype is None or not str(device).startswith("cuda"):
+        return nullcontext()
+    return torch.autocast(device_type="cuda", dtype=dtype)
 
 
 def _cleanup_memory() -> None:
+    import torch
+
     gc.collect()
     if torch.cuda.is_available():
+        if torch.cuda.memory_reserved() - torch.cuda.memory_allocated() <= _EMPTY_CACHE_THRESHOLD:
+            return
         torch.cuda.empty_cache()
         if hasattr(torch.cuda, "ipc_collect"):
             torch.cuda.ipc_collect()
 
 
 @contextmanager
-def _use_model() -> Dict[str, Any]:
-    with _STATE_COND:
-        while _MODEL_STATE["reloading"]:
-            _STATE_COND.wait()
-        _MODEL_STATE["active_jobs"] += 1
-        state = {
-            "tts": _MODEL_STATE["tts"],
-            "ckpt": _MODEL_STATE["ckpt"],
-            "model_kind": _MODEL_STATE["model_kind"],
-            "lang_map": _MODEL_STATE["lang_map"],
-            "spk_map": _MODEL_STATE["spk_map"],
-        }
+def _use_model() -> ModelSnapshot:
+    while True:
+        _RELOAD_EVENT.wait()
+        with _STATE_LOCK:
+            # A reload may have started between the wakeup and taking the lock
+            if _MODEL_STATE["reloading"]:
+                continue
+            _MODEL_STATE["active_jobs"] += 1
+            _IDLE_EVENT.clear()
+            break
     try:
-        yield state
+        yield _SNAPSHOT
     finally:
-        with _STATE_COND:
+        with _STATE_LOCK:
             _MODEL_STATE["active_jobs"] -= 1
             if _MODEL_STATE["active_jobs"] <= 0:
-                _STATE_COND.notify_all()
+                _IDLE_EVENT.set()
+
+
+def _model_error(state: ModelSnapshot, kind: str, label: str) -> Optional[str]:
+    if state.tts is None:
+        return "❌ Model not loaded."
+    if state.model_kind != kind:
+        return f"❌ Current model does not support {label}."
+    return None
+
+
+def _stream_chunks(tts: Qwen3TTSModel, chunks: Iterator[Any]) -> Iterator[Any]:
+    """Produce each chunk as an active job, but hand it out with the job released.
+
+    Gradio resumes a streaming handler at the client's pace and may never resume
+    or close it after a disconnect, so a count held across a yield can stall a
+    reload indefinitely.
+    """
+    try:
+        while True:
+            with _use_model() as state:
+                if state.tts is not tts:
+                    raise RuntimeError("Model was reloaded during generation.")
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        chunks.close()
+
+
+# Parsed voice profiles keyed by the sha1 of the uploaded file, so regenerating skips the reparse
+_PROMPT_CACHE_SIZE = 64
+_PROMPT_CACHE: "OrderedDict[str, List[Any]]" = OrderedDict()
+_PROMPT_CACHE_LOCK = threading.Lock()
+
+
+def _file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+_PROFILE_TENSORS = ("ref_code", "ref_spk_embedding")
+
+
+def _save_profile(items: List[Any], path: str) -> None:
+    """Write voice-clone prompt items as safetensors, with the non-tensor fields as JSON metadata."""
+    import torch
+    from safetensors.torch import save_file
+
+    tensors: Dict[str, Any] = {}
+    meta: List[Dict[str, Any]] = []
+    for i, it in enumerate(items):
+        d = asdict(it)
+        for name in _PROFILE_TENSORS:
+            t = d.pop(name, None)
+            if torch.is_tensor(t):
+                # Store embeddings in fp32 so profiles load under any model dtype
+                if name == "ref_spk_embedding":
+                    t = t.float()
+                tensors[f"item{i}/{name}"] = t.detach().cpu().contiguous()
+        meta.append(d)
+    save_file(tensors, path, metadata={"json": json.dumps(meta)})
+
+
+def _is_safetensors(path: str) -> bool:
+    # 8-byte little-endian header length, then the JSON header; .pt files are zip or pickle
+    with open(path, "rb") as f:
+        return f.read(9)[8:] == b"{"
+
+
+def _load_profile(path: str) -> Any:
+    import torch
+
+    if _is_safetensors(path):
+        from safetensors import safe_open
+
+        with safe_open(path, framework="pt", device="cpu") as f:
+            meta = json.loads((f.metadata() or {}).get("json", "[]"))
+            keys = set(f.keys())
+            for i, d in enumerate(meta):
+                for name in _PROFILE_TENSORS:
+                    if f"item{i}/{name}" in keys:
+                        d[name] = f.get_tensor(f"item{i}/{name}")
+        return {"items": meta}
+
+    # Profiles saved before the switch to safetensors
+    try:
+        # Maps the tensor blobs instead of reading the whole file up front (torch>=2.1)
+        return torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+    except TypeError:
+        with open(path, "rb") as f:
+            return torch.load(f, map_location="cpu", weights_only=True)
+
+
+def _get_cached_prompt(digest: str) -> Optional[List[Any]]:
+    with _PROMPT_CACHE_LOCK:
+        items = _PROMPT_CACHE.get(digest)
+        if items is not None:
+            _PROMPT_CACHE.move_to_end(digest)
+        return items
+
+
+def _put_cached_prompt(digest: str, items: List[Any]) -> None:
+    with _PROMPT_CACHE_LOCK:
+        _PROMPT_CACHE[digest] = items
+        _PROMPT_CACHE.move_to_end(digest)
+        while len(_PROMPT_CACHE) > _PROMPT_CACHE_SIZE:
+            _PROMPT_CACHE.popitem(last=False)
+
+
+_WARMUP_TEXT = "Hello, this is a warmup."
+_WARMUP_MAX_NEW_TOKENS = 32
+
+
+def _warmup_model(state: ModelSnapshot, device: str) -> None:
+    """Run one short generation so cuBLAS init and kernel selection happen at load time."""
+    if state.tts is None or not str(device).startswith("cuda"):
+        return
+    import torch
+
+    kwargs = {"text": _WARMUP_TEXT, "language": "Auto", "max_new_tokens": _WARMUP_MAX_NEW_TOKENS}
+    try:
+        with torch.inference_mode():
+            if state.model_kind == "custom_voice":
+                speaker = next(iter(state.spk_map.values()), None)
+                if speaker is None:
+                    return
+                state.tts.generate_custom_voice(speaker=speaker, **kwargs)
+            elif state.model_kind == "voice_design":
+                state.tts.generate_voice_design(instruct="A calm, clear voice.", **kwargs)
+            else:
+                # One second of silence is enough to exercise the speaker encoder path
+                ref = (np.zeros(16000, dtype=np.float32), 16000)
+                state.tts.generate_voice_clone(ref_audio=ref, x_vector_only_mode=True, **kwargs)
+    except Exception as e:
+        print(f"Warmup skipped: {type(e).__name__}: {e}")
+
+
+class _PendingBatch:
+    __slots__ = ("items", "full", "done", "wavs", "sr", "error")
+
+    def __init__(self) -> None:
+        self.items: List[Dict[str, Any]] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.wavs: List[Any] = []
+        self.sr = 0
+        self.error: Optional[BaseException] = None
+
+    def run(self, fn, shared: Dict[str, Any]) -> None:
+        import torch
+
+        try:
+            with torch.inference_mode():
+                if len(self.items) == 1:
+                    wavs, sr = fn(**shared, **self.items[0])
+                else:
+                    merged = {k: [it[k] for it in self.items] for k in self.items[0]}
+                    wavs, sr = fn(**shared, **merged)
+            if len(wavs) != len(self.items):
+                raise RuntimeError(f"Batched generate returned {len(wavs)} clips for {len(self.items)} inputs.")
+            self.wavs, self.sr = wavs, sr
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+class _GenerateBatcher:
+    """Merge concurrent generate_* calls that share a model and settings into one batched call.
+
+    The first request for a key leads: it waits up to max_wait_ms for others to
+    join, then runs the whole batch on its own Gradio worker thread. Requests with
+    different settings form separate batches and still run concurrently.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float) -> None:
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._open: Dict[Any, _PendingBatch] = {}
+
+    def generate(self, tts: Qwen3TTSModel, method: str, shared: Dict[str, Any], item: Dict[str, Any]) -> Tuple[Any, int]:
+        fn = getattr(tts, method)
+        if self.max_batch_size == 1:
+            import torch
+
+            with torch.inference_mode():
+                wavs, sr = fn(**shared, **item)
+            return wavs[0], sr
+
+        key = (id(tts), method, tuple(sorted(shared.items())))
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = _PendingBatch()
+                self._open[key] = batch
+            idx = len(batch.items)
+            batch.items.append(item)
+            if len(batch.items) >= self.max_batch_size:
+                del self._open[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            batch.run(fn, shared)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.wavs[idx], batch.sr
+
+
+def _iter_generate(
+    batcher: _GenerateBatcher,
+    tts: Qwen3TTSModel,
+    method: str,
+    shared: Dict[str, Any],
+    item: Dict[str, Any],
+):
+    """Yield Gradio audio chunks as the model produces them.
+
+    Uses the model's generate_*_stream variant when it has one; otherwise the
+    request goes through the batcher and the full clip is yielded once.
+    """
+    stream = getattr(tts, f"{method}_stream", None)
+    if stream is None:
+        yield _wav_to_gradio_audio(*batcher.generate(tts, method, shared, item))
+        return
+    for wav, sr in stream(**shared, **item):
+        yield _wav_to_gradio_audio(wav, sr)
 
 
 def _reload_model(
@@ -396,64 +954,65 @@ def _reload_model(
     device: str,
     dtype: torch.dtype,
     attn_impl: Optional[str],
-) -> Dict[str, Any]:
+    quant: str = "none",
+    jit_vocoder: str = "none",
+) -> ModelSnapshot:
     ckpt = (ckpt or "").strip()
     if not ckpt:
         raise ValueError("Checkpoint is required.")
 
-    with _STATE_COND:
+    with _STATE_LOCK:
         _MODEL_STATE["reloading"] = True
-        while _MODEL_STATE["active_jobs"] > 0:
-            _STATE_COND.wait()
-        old_tts = _MODEL_STATE.get("tts")
-        _MODEL_STATE.update(
-            {
-                "tts": None,
-                "ckpt": "",
-                "model_kind": "",
-                "lang_choices_disp": [],
-                "lang_choices_ui": [],
-                "lang_map": {},
-                "spk_choices_disp": [],
-                "spk_map": {},
-            }
-        )
+        _RELOAD_EVENT.clear()
+    # No job can start once reloading is set, so the count only drains from here
+    if not _IDLE_EVENT.wait(_RELOAD_DRAIN_TIMEOUT):
+        with _STATE_LOCK:
+            _MODEL_STATE["reloading"] = False
+            _RELOAD_EVENT.set()
+        raise TimeoutError(f"Model still busy after {_RELOAD_DRAIN_TIMEOUT:.0f}s; try reloading again later.")
+
+    # Drop the only long-lived reference so the old weights can be freed before loading
+    _set_model_state(_EMPTY_SNAPSHOT)
 
     try:
-        if old_tts is not None:
-            del old_tts
         _cleanup_memory()
-        tts = Qwen3TTSModel.from_pretrained(
-            ckpt,
-            device_map=device,
-            dtype=dtype,
-            attn_implementation=attn_impl,
-        )
+        _warm_numba_kernels()
+        tts = _load_tts(ckpt, device, dtype, attn_impl, quant, jit_vocoder)
         state = _build_model_state(tts, ckpt)
+        # Still flagged as reloading, so no request can race the warmup
+        _warmup_model(state, device)
         _set_model_state(state)
     except Exception:
-        with _STATE_COND:
+        with _STATE_LOCK:
             _MODEL_STATE["reloading"] = False
-            _STATE_COND.notify_all()
+            _RELOAD_EVENT.set()
         raise
 
-    with _STATE_COND:
+    with _STATE_LOCK:
         _MODEL_STATE["reloading"] = False
-        _STATE_COND.notify_all()
+        _RELOAD_EVENT.set()
     return state
 
 
 def build_demo(
-    state: Dict[str, Any],
+    state: ModelSnapshot,
     gen_kwargs_default: Dict[str, Any],
     device: str,
     dtype: torch.dtype,
     attn_impl: Optional[str],
+    batcher: _GenerateBatcher,
+    quant: str = "none",
+    jit_vocoder: str = "none",
 ) -> gr.Blocks:
-    ckpt = state["ckpt"]
-    model_kind = state["model_kind"]
-    lang_choices_ui = state["lang_choices_ui"]
-    spk_choices_disp = state["spk_choices_disp"]
+    import gradio as gr
+    import torch
+
+    from .. import VoiceClonePromptItem
+
+    ckpt = state.ckpt
+    model_kind = state.model_kind
+    lang_choices_ui = state.lang_choices_ui
+    spk_choices_disp = state.spk_choices_disp
 
     # Default values for advanced parameters
     default_max_tokens = gen_kwargs_default.get("max_new_tokens", 2048)
@@ -471,6 +1030,31 @@ def build_demo(
         max_tokens, temp, top_k, top_p, rep_pen, 
         do_sample, subtalker_dosample, subtalker_temp, subtalker_top_k, subtalker_top_p
     ) -> Dict[str, Any]:
+        # Gradio usually delivers slider/checkbox values already typed; skip the coercions then
+        if (
+            type(max_tokens) is int
+            and type(top_k) is int
+            and type(subtalker_top_k) is int
+            and type(temp) is float
+            and type(top_p) is float
+            and type(rep_pen) is float
+            and type(subtalker_temp) is float
+            and type(subtalker_top_p) is float
+            and type(do_sample) is bool
+            and type(subtalker_dosample) is bool
+        ):
+            return {
+                "max_new_tokens": max_tokens,
+                "temperature": temp,
+                "top_k": top_k,
+                "top_p": top_p,
+                "repetition_penalty": rep_pen,
+                "do_sample": do_sample,
+                "subtalker_dosample": subtalker_dosample,
+                "subtalker_temperature": subtalker_temp,
+                "subtalker_top_k": subtalker_top_k,
+                "subtalker_top_p": subtalker_top_p,
+            }
         return {
             "max_new_tokens": int(max_tokens),
             "temperature": float(temp),
@@ -504,6 +1088,13 @@ def build_demo(
                 value=ckpt,
                 interactive=True,
             )
+            quant_in = gr.Dropdown(
+                label="Quantization",
+                choices=QUANT_CHOICES,
+                value=quant,
+                interactive=True,
+                info="int4_nf4 needs bitsandbytes; int8_wo / fp8_wo need torchao.",
+            )
             load_btn = gr.Button("🔄 Load Model", variant="primary")
             load_status = gr.Textbox(label="Status", lines=2, interactive=False)
 
@@ -602,33 +1193,45 @@ def build_demo(
 
                 with gr.Column(scale=3):
                     gr.Markdown("### 🔊 Output")
-                    audio_out_custom = gr.Audio(label="Generated Audio", type="numpy")
+                    audio_out_custom = gr.Audio(label="Generated Audio", type="numpy", streaming=True, autoplay=True)
                     err_custom = gr.Textbox(label="Status", lines=2)
 
             def run_instruct(text: str, lang_disp: str, spk_disp: str, instruct: str, *adv_params):
                 try:
                     if not text or not text.strip():
-                        return None, "❌ Text is required."
+                        yield None, "❌ Text is required."
+                        return
                     if not spk_disp:
-                        return None, "❌ Speaker is required."
+                        yield None, "❌ Speaker is required."
+                        return
                     with _use_model() as state:
-                        if state["tts"] is None:
-                            return None, "❌ Model not loaded."
-                        if state["model_kind"] != "custom_voice":
-                            return None, "❌ Current model does not support CustomVoice."
-                        language = state["lang_map"].get(lang_disp, "Auto")
-                        speaker = state["spk_map"].get(spk_disp, spk_disp)
-                        kwargs = _gen_common_kwargs(*adv_params)
-                        wavs, sr = state["tts"].generate_custom_voice(
-                            text=text.strip(),
-                            language=language,
-                            speaker=speaker,
-                            instruct=(instruct or "").strip() or None,
-                            **kwargs,
-                        )
-                        return _wav_to_gradio_audio(wavs[0], sr), "✅ Generation complete!"
+                        tts = state.tts
+                        lang_map = state.lang_map
+                        spk_map = state.spk_map
+                        error = _model_error(state, "custom_voice", "CustomVoice")
+                    if error:
+                        yield None, error
+                        return
+                    language = lang_map.get(lang_disp, "Auto")
+                    speaker = spk_map.get(spk_disp, spk_disp)
+                    kwargs = _gen_common_kwargs(*adv_params)
+                    chunks = _iter_generate(
+                        batcher,
+                        tts,
+                        "generate_custom_voice",
+                        kwargs,
+                        {
+                            "text": text.strip(),
+                            "language": language,
+                            "speaker": speaker,
+                            "instruct": (instruct or "").strip() or None,
+                        },
+                    )
+                    for chunk in _stream_chunks(tts, chunks):
+                        yield chunk, "⏳ Generating..."
+                    yield gr.update(), "✅ Generation complete!"
                 except Exception as e:
-                    return None, f"❌ {type(e).__name__}: {e}"
+                    yield None, f"❌ {type(e).__name__}: {e}"
 
             custom_btn.click(
                 run_instruct,
@@ -662,31 +1265,42 @@ def build_demo(
 
                 with gr.Column(scale=3):
                     gr.Markdown("### 🔊 Output")
-                    audio_out_design = gr.Audio(label="Generated Audio", type="numpy")
+                    audio_out_design = gr.Audio(label="Generated Audio", type="numpy", streaming=True, autoplay=True)
                     err_design = gr.Textbox(label="Status", lines=2)
 
             def run_voice_design(text: str, lang_disp: str, design: str, *adv_params):
                 try:
                     if not text or not text.strip():
-                        return None, "❌ Text is required."
+                        yield None, "❌ Text is required."
+                        return
                     if not design or not design.strip():
-                        return None, "❌ Voice design instruction is required."
+                        yield None, "❌ Voice design instruction is required."
+                        return
                     with _use_model() as state:
-                        if state["tts"] is None:
-                            return None, "❌ Model not loaded."
-                        if state["model_kind"] != "voice_design":
-                            return None, "❌ Current model does not support VoiceDesign."
-                        language = state["lang_map"].get(lang_disp, "Auto")
-                        kwargs = _gen_common_kwargs(*adv_params)
-                        wavs, sr = state["tts"].generate_voice_design(
-                            text=text.strip(),
-                            language=language,
-                            instruct=design.strip(),
-                            **kwargs,
-                        )
-                        return _wav_to_gradio_audio(wavs[0], sr), "✅ Generation complete!"
+                        tts = state.tts
+                        lang_map = state.lang_map
+                        error = _model_error(state, "voice_design", "VoiceDesign")
+                    if error:
+                        yield None, error
+                        return
+                    language = lang_map.get(lang_disp, "Auto")
+                    kwargs = _gen_common_kwargs(*adv_params)
+                    chunks = _iter_generate(
+                        batcher,
+                        tts,
+                        "generate_voice_design",
+                        kwargs,
+                        {
+                            "text": text.strip(),
+                            "language": language,
+                            "instruct": design.strip(),
+                        },
+                    )
+                    for chunk in _stream_chunks(tts, chunks):
+                        yield chunk, "⏳ Generating..."
+                    yield gr.update(), "✅ Generation complete!"
                 except Exception as e:
-                    return None, f"❌ {type(e).__name__}: {e}"
+                    yield None, f"❌ {type(e).__name__}: {e}"
 
             design_btn.click(
                 run_voice_design,
@@ -731,39 +1345,51 @@ def build_demo(
 
                         with gr.Column(scale=3):
                             gr.Markdown("### 🔊 Output")
-                            audio_out_clone = gr.Audio(label="Generated Audio", type="numpy")
+                            audio_out_clone = gr.Audio(label="Generated Audio", type="numpy", streaming=True, autoplay=True)
                             err_clone = gr.Textbox(label="Status", lines=2)
 
                     def run_voice_clone(ref_aud, ref_txt: str, use_xvec: bool, text: str, lang_disp: str, *adv_params):
                         try:
                             if not text or not text.strip():
-                                return None, "❌ Target text is required."
+                                yield None, "❌ Target text is required."
+                                return
                             at = _audio_to_tuple(ref_aud)
                             if at is None:
-                                return None, "❌ Reference audio is required."
+                                yield None, "❌ Reference audio is required."
+                                return
                             if (not use_xvec) and (not ref_txt or not ref_txt.strip()):
-                                return None, (
+                                yield None, (
                                     "❌ Reference text is required when x-vector only mode is NOT enabled.\n"
                                     "Either provide reference text or enable x-vector only mode (though quality will be lower)."
                                 )
+                                return
                             with _use_model() as state:
-                                if state["tts"] is None:
-                                    return None, "❌ Model not loaded."
-                                if state["model_kind"] != "base":
-                                    return None, "❌ Current model does not support voice cloning."
-                                language = state["lang_map"].get(lang_disp, "Auto")
-                                kwargs = _gen_common_kwargs(*adv_params)
-                                wavs, sr = state["tts"].generate_voice_clone(
-                                    text=text.strip(),
-                                    language=language,
-                                    ref_audio=at,
-                                    ref_text=(ref_txt.strip() if ref_txt else None),
-                                    x_vector_only_mode=bool(use_xvec),
-                                    **kwargs,
-                                )
-                                return _wav_to_gradio_audio(wavs[0], sr), "✅ Generation complete!"
+                                tts = state.tts
+                                lang_map = state.lang_map
+                                error = _model_error(state, "base", "voice cloning")
+                            if error:
+                                yield None, error
+                                return
+                            language = lang_map.get(lang_disp, "Auto")
+                            kwargs = _gen_common_kwargs(*adv_params)
+                            kwargs["x_vector_only_mode"] = bool(use_xvec)
+                            chunks = _iter_generate(
+                                batcher,
+                                tts,
+                                "generate_voice_clone",
+                                kwargs,
+                                {
+                                    "text": text.strip(),
+                                    "language": language,
+                                    "ref_audio": at,
+                                    "ref_text": (ref_txt.strip() if ref_txt else None),
+                                },
+                            )
+                            for chunk in _stream_chunks(tts, chunks):
+                                yield chunk, "⏳ Generating..."
+                            yield gr.update(), "✅ Generation complete!"
                         except Exception as e:
-                            return None, f"❌ {type(e).__name__}: {e}"
+                            yield None, f"❌ {type(e).__name__}: {e}"
 
                     clone_btn.click(
                         run_voice_clone,
@@ -791,7 +1417,7 @@ Create a reusable voice profile from reference audio that can be loaded later.
                                 value=False
                             )
                             save_btn = gr.Button("💾 Save Voice Profile", variant="primary")
-                            prompt_file_out = gr.File(label="Voice Profile File (.pt)")
+                            prompt_file_out = gr.File(label="Voice Profile File (.safetensors)")
 
                         with gr.Column(scale=2):
                             gr.Markdown(
@@ -800,7 +1426,7 @@ Create a reusable voice profile from reference audio that can be loaded later.
 Upload a previously saved voice profile and generate new speech.
 """
                             )
-                            prompt_file_in = gr.File(label="Upload Voice Profile (.pt)")
+                            prompt_file_in = gr.File(label="Upload Voice Profile (.safetensors or legacy .pt)")
                             text_in_clone2 = gr.Textbox(
                                 label="Target Text",
                                 lines=4,
@@ -830,21 +1456,21 @@ Upload a previously saved voice profile and generate new speech.
                                     "Either provide reference text or enable x-vector only mode (though quality will be lower)."
                                 )
                             with _use_model() as state:
-                                if state["tts"] is None:
+                                tts = state.tts
+                                kind = state.model_kind
+                                if tts is None:
                                     return None, "❌ Model not loaded."
-                                if state["model_kind"] != "base":
+                                if kind != "base":
                                     return None, "❌ Current model does not support voice cloning."
-                                items = state["tts"].create_voice_clone_prompt(
-                                    ref_audio=at,
-                                    ref_text=(ref_txt.strip() if ref_txt else None),
-                                    x_vector_only_mode=bool(use_xvec),
-                                )
-                            payload = {
-                                "items": [asdict(it) for it in items],
-                            }
-                            fd, out_path = tempfile.mkstemp(prefix="voice_clone_prompt_", suffix=".pt")
+                                with torch.inference_mode(), _ref_autocast(device):
+                                    items = tts.create_voice_clone_prompt(
+                                        ref_audio=at,
+                                        ref_text=(ref_txt.strip() if ref_txt else None),
+                                        x_vector_only_mode=bool(use_xvec),
+                                    )
+                            fd, out_path = tempfile.mkstemp(prefix="voice_clone_prompt_", suffix=".safetensors")
                             os.close(fd)
-                            torch.save(payload, out_path)
+                            _save_profile(items, out_path)
                             return out_path, "✅ Voice profile saved successfully!"
                         except Exception as e:
                             return None, f"❌ {type(e).__name__}: {e}"
@@ -857,50 +1483,62 @@ Upload a previously saved voice profile and generate new speech.
                                 return None, "❌ Target text is required."
 
                             path = getattr(file_obj, "name", None) or getattr(file_obj, "path", None) or str(file_obj)
-                            payload = torch.load(path, map_location="cpu", weights_only=True)
-                            if not isinstance(payload, dict) or "items" not in payload:
-                                return None, "❌ Invalid file format."
-
-                            items_raw = payload["items"]
-                            if not isinstance(items_raw, list) or len(items_raw) == 0:
-                                return None, "❌ Empty voice items in profile."
-
-                            items: List[VoiceClonePromptItem] = []
-                            for d in items_raw:
-                                if not isinstance(d, dict):
-                                    return None, "❌ Invalid item format in file."
-                                ref_code = d.get("ref_code", None)
-                                if ref_code is not None and not torch.is_tensor(ref_code):
-                                    ref_code = torch.tensor(ref_code)
-                                ref_spk = d.get("ref_spk_embedding", None)
-                                if ref_spk is None:
-                                    return None, "❌ Missing speaker embedding."
-                                if not torch.is_tensor(ref_spk):
-                                    ref_spk = torch.tensor(ref_spk)
-
-                                items.append(
-                                    VoiceClonePromptItem(
-                                        ref_code=ref_code,
-                                        ref_spk_embedding=ref_spk,
-                                        x_vector_only_mode=bool(d.get("x_vector_only_mode", False)),
-                                        icl_mode=bool(d.get("icl_mode", not bool(d.get("x_vector_only_mode", False)))),
-                                        ref_text=d.get("ref_text", None),
+                            digest = _file_sha1(path)
+                            items = _get_cached_prompt(digest)
+                            if items is None:
+                                payload = _load_profile(path)
+                                if not isinstance(payload, dict) or "items" not in payload:
+                                    return None, "❌ Invalid file format."
+
+                                items_raw = payload["items"]
+                                if not isinstance(items_raw, list) or len(items_raw) == 0:
+                                    return None, "❌ Empty voice items in profile."
+
+                                items = []
+                                for d in items_raw:
+                                    if not isinstance(d, dict):
+                                        return None, "❌ Invalid item format in file."
+                                    ref_code = d.get("ref_code", None)
+                                    if ref_code is not None and not torch.is_tensor(ref_code):
+                                        ref_code = torch.tensor(ref_code)
+                                    ref_spk = d.get("ref_spk_embedding", None)
+                                    if ref_spk is None:
+                                        return None, "❌ Missing speaker embedding."
+                                    if not torch.is_tensor(ref_spk):
+                                        ref_spk = torch.tensor(ref_spk)
+                                    # Cached items live on the model device, so hits skip the copy
+                                    ref_spk = ref_spk.to(device, non_blocking=True)
+                                    if ref_code is not None:
+                                        ref_code = ref_code.to(device, non_blocking=True)
+
+                                    items.append(
+                                        VoiceClonePromptItem(
+                                            ref_code=ref_code,
+                                            ref_spk_embedding=ref_spk,
+                                            x_vector_only_mode=bool(d.get("x_vector_only_mode", False)),
+                                            icl_mode=bool(d.get("icl_mode", not bool(d.get("x_vector_only_mode", False)))),
+                                            ref_text=d.get("ref_text", None),
+                                        )
                                     )
-                                )
+                                _put_cached_prompt(digest, items)
 
                             with _use_model() as state:
-                                if state["tts"] is None:
+                                tts = state.tts
+                                kind = state.model_kind
+                                lang_map = state.lang_map
+                                if tts is None:
                                     return None, "❌ Model not loaded."
-                                if state["model_kind"] != "base":
+                                if kind != "base":
                                     return None, "❌ Current model does not support voice cloning."
-                                language = state["lang_map"].get(lang_disp, "Auto")
+                                language = lang_map.get(lang_disp, "Auto")
                                 kwargs = _gen_common_kwargs(*adv_params)
-                                wavs, sr = state["tts"].generate_voice_clone(
-                                    text=text.strip(),
-                                    language=language,
-                                    voice_clone_prompt=items,
-                                    **kwargs,
-                                )
+                                with torch.inference_mode():
+                                    wavs, sr = tts.generate_voice_clone(
+                                        text=text.strip(),
+                                        language=language,
+                                        voice_clone_prompt=items,
+                                        **kwargs,
+                                    )
                                 return _wav_to_gradio_audio(wavs[0], sr), "✅ Generation complete!"
                         except Exception as e:
                             return None, (
@@ -1009,28 +1647,28 @@ The subtalker model generates fine-grained acoustic details. These parameters co
 """)
 
         model_info_md = gr.Markdown(
-            _format_model_info(state["lang_choices_disp"], state["spk_choices_disp"])
+            _format_model_info(state.lang_choices_disp, state.spk_choices_disp)
         )
 
-        def load_model(ckpt_value: str):
+        def load_model(ckpt_value: str, quant_value: str):
             try:
-                new_state = _reload_model(ckpt_value, device, dtype, attn_impl)
-                lang_choices_ui = new_state["lang_choices_ui"]
+                new_state = _reload_model(ckpt_value, device, dtype, attn_impl, quant_value, jit_vocoder)
+                lang_choices_ui = new_state.lang_choices_ui
                 lang_value = _default_lang_value(lang_choices_ui)
-                spk_choices = new_state["spk_choices_disp"]
+                spk_choices = new_state.spk_choices_disp
                 spk_value = _default_spk_value(spk_choices)
                 return (
-                    _format_header(new_state["ckpt"], new_state["model_kind"]),
-                    _format_model_info(new_state["lang_choices_disp"], new_state["spk_choices_disp"]),
-                    gr.update(visible=new_state["model_kind"] == "custom_voice"),
-                    gr.update(visible=new_state["model_kind"] == "voice_design"),
-                    gr.update(visible=new_state["model_kind"] == "base"),
+                    _format_header(new_state.ckpt, new_state.model_kind),
+                    _format_model_info(new_state.lang_choices_disp, new_state.spk_choices_disp),
+                    gr.update(visible=new_state.model_kind == "custom_voice"),
+                    gr.update(visible=new_state.model_kind == "voice_design"),
+                    gr.update(visible=new_state.model_kind == "base"),
                     gr.update(choices=lang_choices_ui, value=lang_value),
                     gr.update(choices=lang_choices_ui, value=lang_value),
                     gr.update(choices=lang_choices_ui, value=lang_value),
                     gr.update(choices=lang_choices_ui, value=lang_value),
                     gr.update(choices=spk_choices, value=spk_value),
-                    gr.update(value=new_state["ckpt"]),
+                    gr.update(value=new_state.ckpt),
                     "✅ Model loaded successfully!",
                 )
             except Exception as e:
@@ -1051,7 +1689,7 @@ The subtalker model generates fine-grained acoustic details. These parameters co
 
         load_btn.click(
             load_model,
-            inputs=[ckpt_in],
+            inputs=[ckpt_in, quant_in],
             outputs=[
                 header_md,
                 model_info_md,
@@ -1081,6 +1719,11 @@ def main(argv=None) -> int:
 
     ckpt = _resolve_checkpoint(args)
 
+    # gradio is only needed once the model is up; import it alongside the weight load
+    threading.Thread(target=importlib.import_module, args=("gradio",), name="gradio-prefetch", daemon=True).start()
+    # Compiles the normalize kernels on a background thread while the weights load
+    _warm_numba_kernels()
+
     dtype = _dtype_from_str(args.dtype)
     attn_impl = "flash_attention_2" if args.flash_attn else None
 
@@ -1088,20 +1731,22 @@ def main(argv=None) -> int:
     print(f"Device: {args.device}")
     print(f"Dtype: {dtype}")
     print(f"Attention: {attn_impl}")
+    print(f"Quantization: {args.quant}")
 
-    tts = Qwen3TTSModel.from_pretrained(
-        ckpt,
-        device_map=args.device,
-        dtype=dtype,
-        attn_implementation=attn_impl,
-    )
+    tts = _load_tts(ckpt, args.device, dtype, attn_impl, args.quant, args.jit_vocoder)
 
     print("Model loaded successfully!")
 
     gen_kwargs_default = _collect_gen_kwargs(args)
     state = _build_model_state(tts, ckpt)
+    _warmup_model(state, args.device)
     _set_model_state(state)
-    demo = build_demo(state, gen_kwargs_default, args.device, dtype, attn_impl)
+    batcher = _GenerateBatcher(args.max_batch_size, args.max_wait_ms)
+    demo = build_demo(
+        state, gen_kwargs_default, args.device, dtype, attn_impl, batcher, args.quant, args.jit_vocoder
+    )
+    # Leave _SNAPSHOT as the only owner so a reload can actually free these weights
+    del tts, state
 
     launch_kwargs: Dict[str, Any] = dict(
         server_name=args.ip,
@@ -5,16 +5,33 @@ Run alongside your existing Gradio interface
 """
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
+from collections import OrderedDict
+import numpy as np
 import torch
 import torchaudio
-import tempfile
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 import os
 import logging
+import copy
 import gc
+import hashlib
+import io
+import asyncio
 import threading
+from contextlib import contextmanager, nullcontext
+from dataclasses import replace
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 # Import Qwen3-TTS
 from qwen_tts import Qwen3TTSModel
@@ -24,11 +41,33 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Qwen3-TTS API")
 
-# Global model instance
-tts_model = None
-model_kind = None
-model_checkpoint = None
-model_lock = threading.Lock()
+# Resident models keyed by checkpoint, least recently activated first
+_MODEL_REGISTRY: "OrderedDict[str, Tuple[Qwen3TTSModel, str]]" = OrderedDict()
+_ACTIVE_KEY: Optional[str] = None
+model_lock = threading.Lock()  # serializes loads and switches
+# Guards the registry and the per-model count of in-flight requests (keyed by id(model))
+_MODEL_COND = threading.Condition()
+_MODEL_REFS: dict = {}
+# Cached CUDA blocks go back to the driver only after this long without requests
+IDLE_EMPTY_CACHE_S = float(os.environ.get("QWEN_TTS_IDLE_EMPTY_CACHE_S", "30"))
+_IDLE_TIMER: Optional[threading.Timer] = None
+
+# Voice-clone prompts already on DEVICE, keyed by (checkpoint, audio sha1, ref_text, x_vector_only)
+PROMPT_CACHE_SIZE = 64
+_PROMPT_CACHE: "OrderedDict[tuple, list]" = OrderedDict()
+_PROMPT_CACHE_LOCK = threading.Lock()
+
+# CPU-bound reference audio decoding runs here, off the event loop
+_IO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tts-io")
+
+# Requests arriving within BATCH_WINDOW_MS with identical settings share one generate_* call
+BATCH_MAX_SIZE = max(1, int(os.environ.get("QWEN_TTS_MAX_BATCH_SIZE", "4")))
+BATCH_WINDOW_MS = float(os.environ.get("QWEN_TTS_BATCH_WINDOW_MS", "10"))
+_BATCH_QUEUE: Optional[asyncio.Queue] = None
+_BATCH_TASK: Optional[asyncio.Task] = None
+_WARMUP_TASK: Optional[asyncio.Future] = None
+# One generation at a time on the GPU; the event loop stays free to accept and batch requests
+_GEN_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-gen")
 
 MODEL_OPTIONS = {
     "base": "Qwen/Qwen3-TTS-12Hz-1.7B-Base",
@@ -40,24 +79,118 @@ DEFAULT_MODEL = "base"
 DEVICE = "cuda:0"
 DTYPE = torch.bfloat16
 ATTN_IMPL = None  # or "flash_attention_2" if installed
+# Autocast dtype for the reference encoder in create_voice_clone_prompt: fp16 | bf16 | fp32
+REF_PRECISION = os.environ.get("QWEN_TTS_REF_PRECISION", "fp16").strip().lower()
+_REF_AUTOCAST_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16}
+# Int8 speaker encoder for voice-clone prompt building; the LM keeps DTYPE
+ENCODER_INT8 = os.environ.get("QWEN_TTS_ENCODER_INT8", "0") == "1"
+ENCODER_INT8_MIN_COSINE = 0.99
+_SPEAKER_ENCODER_ATTRS = ("speaker_encoder", "spk_encoder")
+# Keep switched-away checkpoints in VRAM so switching back is a pointer swap
+KEEP_ALL_MODELS = os.environ.get("KEEP_ALL_MODELS", "0") == "1"
+MAX_RESIDENT_MODELS = (
+    int(os.environ.get("QWEN_TTS_MAX_RESIDENT_MODELS", len(MODEL_OPTIONS))) if KEEP_ALL_MODELS else 1
+)
+COMPILE_MODEL = os.environ.get("QWEN_TTS_COMPILE", "0") == "1"
+COMPILE_WARMUP_TOKENS = 512
+# With QWEN_TTS_COMPILE=1 the vocoder replays a CUDA graph per padded input-length bucket
+# Codec frames, ~5-43 s at 12 Hz; longer decoder calls run eagerly
+VOCODER_GRAPH_BUCKETS = (64, 128, 256, 512)
+VOCODER_GRAPH_MAX_FAILURES = 3
+_VOCODER_PATHS = ("vocoder", "speech_tokenizer.model.decoder", "speech_tokenizer.decoder")
+# Pre-allocated KV-cache that generate() keeps on the model and resets between calls
+STATIC_CACHE = os.environ.get("QWEN_TTS_STATIC_CACHE", "1" if COMPILE_MODEL else "0") == "1"
+CACHE_KWARGS = {"cache_implementation": "static"} if STATIC_CACHE else {}
+
+def _active_model():
+    """Return (model, kind, checkpoint) of the active model, or Nones if none is loaded."""
+    entry = _MODEL_REGISTRY.get(_ACTIVE_KEY) if _ACTIVE_KEY is not None else None
+    if entry is None:
+        return None, None, None
+    return entry[0], entry[1], _ACTIVE_KEY
+
+@contextmanager
+def _acquire_model():
+    """Pin the active model for one request; yields (model, kind, checkpoint)."""
+    with _MODEL_COND:
+        tts_model, model_kind, model_checkpoint = _active_model()
+        if tts_model is not None:
+            _MODEL_REFS[id(tts_model)] = _MODEL_REFS.get(id(tts_model), 0) + 1
+    try:
+        yield tts_model, model_kind, model_checkpoint
+    finally:
+        if tts_model is not None:
+            with _MODEL_COND:
+                _MODEL_REFS[id(tts_model)] -= 1
+                if _MODEL_REFS[id(tts_model)] == 0:
+                    del _MODEL_REFS[id(tts_model)]
+                    _MODEL_COND.notify_all()
+                    if not _MODEL_REFS:
+                        _schedule_idle_cleanup()
+
+def _schedule_idle_cleanup():
+    """(Re)arm the timer that empties the CUDA cache once the API has gone idle."""
+    global _IDLE_TIMER
+    if IDLE_EMPTY_CACHE_S <= 0 or not torch.cuda.is_available():
+        return
+    # Called from request threads, the load thread and eviction; swap the timer atomically
+    # so racing calls can't leave an orphaned one running
+    with _MODEL_COND:
+        if _IDLE_TIMER is not None:
+            _IDLE_TIMER.cancel()
+        _IDLE_TIMER = threading.Timer(IDLE_EMPTY_CACHE_S, _idle_cleanup)
+        _IDLE_TIMER.daemon = True
+        _IDLE_TIMER.start()
+
+def _idle_cleanup():
+    """Empty the CUDA cache unless requests or a load arrived meanwhile."""
+    # Emptying mid-load would stall it on the device sync and hand back blocks it is about
+    # to reuse; try again once it has had time to finish
+    if not model_lock.acquire(blocking=False):
+        _schedule_idle_cleanup()
+        return
+    try:
+        with _MODEL_COND:
+            # In-flight requests re-arm the timer on release; a timer replaced after it fired is stale
+            if _MODEL_REFS or _IDLE_TIMER is not threading.current_thread():
+                return
+        torch.cuda.empty_cache()
+    finally:
+        model_lock.release()
 
-def _clear_model():
-    """Release model memory."""
-    global tts_model, model_kind, model_checkpoint
-    if tts_model is not None:
-        del tts_model
-        tts_model = None
-        model_kind = None
-        model_checkpoint = None
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+def _evict_models(keep: int):
+    """Release least recently used models until at most `keep` remain."""
+    global _ACTIVE_KEY
+    with _MODEL_COND:
+        if len(_MODEL_REGISTRY) <= keep:
+            return
+        evicted = []
+        while len(_MODEL_REGISTRY) > keep:
+            checkpoint, (model, _) = _MODEL_REGISTRY.popitem(last=False)
+            if checkpoint == _ACTIVE_KEY:
+                _ACTIVE_KEY = None
+            evicted.append(id(model))
+            logger.info(f"Evicted model {checkpoint}")
+        del model
+        # New requests can no longer see the evicted models; wait out the ones still using them
+        _MODEL_COND.wait_for(lambda: not any(ref in _MODEL_REFS for ref in evicted))
+    # Eviction is always followed by a load, which reuses the freed blocks from torch's
+    # caching allocator; returning them to the driver now would only add a sync
+    gc.collect()
+    _schedule_idle_cleanup()
 
 def _load_model(checkpoint: str):
-    """Load a Qwen3-TTS model checkpoint."""
-    global tts_model, model_kind, model_checkpoint
+    """Activate a Qwen3-TTS model checkpoint, loading it if it isn't resident."""
+    global _ACTIVE_KEY
     with model_lock:
-        _clear_model()
+        with _MODEL_COND:
+            if checkpoint in _MODEL_REGISTRY:
+                _MODEL_REGISTRY.move_to_end(checkpoint)
+                _ACTIVE_KEY = checkpoint
+                logger.info(f"Switched to resident model {checkpoint}")
+                return
+        # Free room before loading so peak VRAM stays bounded
+        _evict_models(MAX_RESIDENT_MODELS - 1)
         logger.info(f"Loading model from {checkpoint}...")
         tts_model = Qwen3TTSModel.from_pretrained(
             checkpoint,
@@ -66,42 +199,496 @@ def _load_model(checkpoint: str):
             attn_implementation=ATTN_IMPL
         )
         model_kind = getattr(tts_model.model, "tts_model_type", "base")
-        model_checkpoint = checkpoint
+        if ENCODER_INT8 and model_kind == "base":
+            _quantize_speaker_encoder(tts_model)
+        if COMPILE_MODEL:
+            _graph_vocoder(tts_model)
+            _compile_model(tts_model, model_kind)
+        with _MODEL_COND:
+            _MODEL_REGISTRY[checkpoint] = (tts_model, model_kind)
+            _ACTIVE_KEY = checkpoint
         logger.info(f"Model loaded successfully! Type: {model_kind}")
 
+def _reference_embedding(model):
+    """Speaker embedding of a fixed noise clip, used to check encoder drift."""
+    gen = torch.Generator().manual_seed(0)
+    noise = (torch.rand(12000, generator=gen) * 0.2 - 0.1).numpy()
+    with torch.inference_mode():
+        items = model.create_voice_clone_prompt(ref_audio=(noise, 12000), x_vector_only_mode=True)
+    return items[0].ref_spk_embedding.float().flatten().cpu()
+
+def _quantize_speaker_encoder(model):
+    """Quantize the speaker encoder's Linear layers to int8, keeping it only if embeddings barely move."""
+    name = next((a for a in _SPEAKER_ENCODER_ATTRS if isinstance(getattr(model.model, a, None), torch.nn.Module)), None)
+    if name is None:
+        logger.warning("Encoder int8 skipped: speaker encoder not found")
+        return
+    encoder = getattr(model.model, name)
+    original = None
+    try:
+        before = _reference_embedding(model)
+        original = copy.deepcopy(encoder)
+        if DEVICE.startswith("cuda"):
+            # Dynamic quantization is CPU-only; torchao runs int8 weights on CUDA
+            from torchao.quantization import quantize_
+            try:
+                from torchao.quantization import Int8WeightOnlyConfig
+                config = Int8WeightOnlyConfig()
+            except ImportError:
+                from torchao.quantization import int8_weight_only
+                config = int8_weight_only()
+            quantize_(encoder, config)
+        else:
+            encoder = torch.ao.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+            setattr(model.model, name, encoder)
+        cosine = torch.nn.functional.cosine_similarity(before, _reference_embedding(model), dim=0).item()
+    except Exception as e:
+        if original is not None:
+            setattr(model.model, name, original)
+        logger.warning(f"Encoder int8 skipped: {e}")
+        return
+    if cosine < ENCODER_INT8_MIN_COSINE:
+        setattr(model.model, name, original)
+        logger.warning(f"Encoder int8 reverted: cosine similarity {cosine:.4f} < {ENCODER_INT8_MIN_COSINE}")
+        return
+    logger.info(f"Speaker encoder quantized to int8 (cosine similarity {cosine:.4f})")
+
+class _GraphedVocoder(torch.nn.Module):
+    """Replay the vocoder from CUDA graphs captured once per padded input-length bucket.
+
+    Inputs are zero-padded on the time axis up to the bucket and the output is
+    sliced back in proportion. When a bucket is captured, a padded input is run
+    both eagerly and through the replay; if padding changes the output (a decoder
+    that looks ahead or normalises over time) that bucket stays eager. Anything
+    else the graphs can't serve (CPU, grad mode, extra arguments, longer inputs)
+    runs eagerly too.
+    """
+
+    def __init__(self, module: torch.nn.Module):
+        super().__init__()
+        self.module = module
+        self._graphs = {}
+        self._failures = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def forward(self, x, *args, **kwargs):
+        if args or kwargs or not isinstance(x, torch.Tensor) or not x.is_cuda or torch.is_grad_enabled():
+            return self.module(x, *args, **kwargs)
+        bucket = next((b for b in VOCODER_GRAPH_BUCKETS if b >= x.shape[-1]), None)
+        if bucket is None:
+            return self.module(x)
+        key = (bucket, tuple(x.shape[:-1]), x.dtype, x.device)
+        # Every bucket's graph allocates from one shared pool, so a replay can overwrite
+        # another graph's static output; replays are serialised here and each result is
+        # cloned before the lock is released, which makes replaying in any order safe
+        with self._lock:
+            if key not in self._graphs:
+                return self._capture(key, x, bucket)
+            entry = self._graphs[key]
+            if entry is None:
+                return self.module(x)
+            return self._replay(entry, x, bucket)
+
+    @staticmethod
+    def _replay(entry, x, bucket: int):
+        graph, static_in, static_out = entry
+        length = x.shape[-1]
+        static_in.zero_()
+        static_in[..., :length].copy_(x)
+        graph.replay()
+        # The next replay overwrites static_out
+        return static_out[..., : static_out.shape[-1] * length // bucket].clone()
+
+    def _capture(self, key, x, bucket: int):
+        """Try to capture the bucket's graph, verified against eager output on a padded input; returns the eager output."""
+        eager = self.module(x)
+        try:
+            if self._pool is None:
+                # All buckets and shapes share one memory pool
+                self._pool = torch.cuda.graph_pool_handle()
+            static_in = torch.zeros(*x.shape[:-1], bucket, dtype=x.dtype, device=x.device)
+            # Warm up on a side stream so lazy init and autotuning stay out of the graph
+            stream = torch.cuda.Stream(device=x.device)
+            stream.wait_stream(torch.cuda.current_stream(x.device))
+            with torch.cuda.stream(stream):
+                for _ in range(2):
+                    self.module(static_in)
+            torch.cuda.current_stream(x.device).wait_stream(stream)
+            graph = torch.cuda.CUDAGraph()
+            # thread_local: other threads' CUDA calls during capture don't invalidate it
+            with torch.cuda.graph(graph, pool=self._pool, capture_error_mode="thread_local"):
+                static_out = self.module(static_in)
+        except Exception as e:
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            if failures >= VOCODER_GRAPH_MAX_FAILURES:
+                self._graphs[key] = None
+                logger.warning(f"Vocoder CUDA graph capture failed for {bucket} frames, running eagerly: {e}")
+            else:
+                logger.warning(f"Vocoder CUDA graph capture failed for {bucket} frames, will retry: {e}")
+            return eager
+
+        entry = (graph, static_in, static_out)
+        matches = isinstance(static_out, torch.Tensor) and isinstance(eager, torch.Tensor)
+        if matches:
+            # An input filling the bucket gets no padding and would pass trivially,
+            # so verify on a prefix that does
+            probe, expected = x, eager
+            if x.shape[-1] >= bucket:
+                probe = x[..., : bucket // 2]
+                expected = self.module(probe)
+            replayed = self._replay(entry, probe, bucket)
+            matches = (
+                isinstance(expected, torch.Tensor)
+                and replayed.shape == expected.shape
+                and torch.allclose(replayed.float(), expected.float(), rtol=1e-2, atol=1e-3)
+            )
+        if not matches:
+            self._graphs[key] = None
+            logger.warning(f"Vocoder CUDA graph for {bucket} frames differs from eager output, running eagerly")
+            return eager
+        self._graphs[key] = entry
+        logger.info(f"Captured vocoder CUDA graph for {bucket} frames")
+        return eager
+
+def _graph_vocoder(model):
+    """Swap the codec decoder for a _GraphedVocoder wrapper; graphs are captured lazily."""
+    if not DEVICE.startswith("cuda"):
+        return
+    for path in _VOCODER_PATHS:
+        *parents, name = path.split(".")
+        owner = model.model
+        for attr in parents:
+            owner = getattr(owner, attr, None)
+            if owner is None:
+                break
+        module = getattr(owner, name, None) if owner is not None else None
+        if isinstance(module, torch.nn.Module):
+            setattr(owner, name, _GraphedVocoder(module))
+            return
+    logger.warning("Vocoder CUDA graphs skipped: decoder module not found")
+
+def _compile_model(model, kind: str):
+    """Compile the talker LM forward and queue a warmup so requests don't pay the compile."""
+    lm = getattr(model.model, "talker", model.model)
+    # Dynamic after the first recompile, so each new static-cache length doesn't add a graph
+    lm.forward = torch.compile(lm.forward, mode="reduce-overhead", dynamic=None)
+    # reduce-overhead records its CUDA graphs per thread, so warm up where requests will run
+    _GEN_POOL.submit(_warmup_compiled, model, kind)
+
+def _warmup_compiled(model, kind: str):
+    """Run one short generation through the compiled model on the generation thread."""
+    logger.info("Compiling model (one-time warmup)...")
+    try:
+        with torch.inference_mode():
+            if kind == "custom_voice":
+                speakers = model.model.get_supported_speakers() or ["Vivian"]
+                model.generate_custom_voice(
+                    text="a", language="Auto", speaker=speakers[0],
+                    max_new_tokens=COMPILE_WARMUP_TOKENS, **CACHE_KWARGS
+                )
+            else:
+                model.generate_voice_design(
+                    text="a", language="Auto", instruct="A neutral voice.",
+                    max_new_tokens=COMPILE_WARMUP_TOKENS, **CACHE_KWARGS
+                )
+    except Exception as e:
+        logger.warning(f"Compile warmup failed, first request will compile instead: {e}")
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _mono_mixdown_f32(x):
+        """Average a [C, T] array over channels into a new float32 [T] array."""
+        nch, n = x.shape
+        y = np.zeros(n, dtype=np.float32)
+        # Channel-outer keeps the inner loop contiguous for the usual C-ordered [C, T] input
+        for c in range(nch):
+            for i in range(n):
+                y[i] += np.float32(x[c, i])
+        inv = np.float32(1.0 / nch)
+        for i in range(n):
+            y[i] *= inv
+        return y
+
+    @njit(cache=True, fastmath=True)
+    def _mono_mixdown_tc_f32(x):
+        """Average an interleaved [T, C] array over channels into a new float32 [T] array."""
+        n, nch = x.shape
+        y = np.empty(n, dtype=np.float32)
+        inv = np.float32(1.0 / nch)
+        # Sample-outer walks soundfile's C-ordered frames in memory order
+        if nch == 2:
+            # Fixed channel count lets the loop vectorise; stereo is nearly every upload
+            for i in range(n):
+                y[i] = (np.float32(x[i, 0]) + np.float32(x[i, 1])) * inv
+            return y
+        for i in range(n):
+            acc = np.float32(0.0)
+            for c in range(nch):
+                acc += np.float32(x[i, c])
+            y[i] = acc * inv
+        return y
+else:
+    def _mono_mixdown_f32(x):
+        """Average a [C, T] array over channels into a new float32 [T] array."""
+        return x.mean(axis=0, dtype=np.float32)
+
+    def _mono_mixdown_tc_f32(x):
+        """Average an interleaved [T, C] array over channels into a new float32 [T] array."""
+        return x.mean(axis=1, dtype=np.float32)
+
+def _ensure_mono_2d(x, channel_axis: int = 0) -> torch.Tensor:
+    """View audio as a [1, T] tensor; only multi-channel input is averaged into a new tensor.
+
+    2-D input is channels-first [C, T] (torchaudio, model outputs) unless channel_axis=1,
+    which takes frame-major [T, C] as soundfile returns it.
+    """
+    if channel_axis not in (0, 1):
+        raise ValueError(f"channel_axis must be 0 or 1, got {channel_axis}")
+    if isinstance(x, np.ndarray) and x.ndim == 2 and x.shape[channel_axis] > 1:
+        mixdown = _mono_mixdown_f32 if channel_axis == 0 else _mono_mixdown_tc_f32
+        return torch.from_numpy(mixdown(x)).unsqueeze(0)
+    tensor = torch.as_tensor(x)
+    if tensor.dim() == 1:
+        return tensor.unsqueeze(0)
+    if tensor.dim() == 2:
+        if channel_axis == 1:
+            tensor = tensor.T
+        if tensor.shape[0] > 1:
+            return tensor.mean(dim=0, keepdim=True)
+    return tensor
+
 def _normalize_audio(audio_data, sr):
     """Normalize audio from uploaded file"""
-    import numpy as np
-    if isinstance(audio_data, np.ndarray):
-        audio_tensor = torch.from_numpy(audio_data).float()
-    else:
-        audio_tensor = audio_data
-    
-    if audio_tensor.dim() == 1:
-        audio_tensor = audio_tensor.unsqueeze(0)
-    elif audio_tensor.dim() == 2 and audio_tensor.shape[0] > 1:
-        audio_tensor = torch.mean(audio_tensor, dim=0, keepdim=True)
-    
+    audio_tensor = _ensure_mono_2d(audio_data)
+    if not audio_tensor.is_floating_point():
+        audio_tensor = audio_tensor.float()
     return audio_tensor, sr
 
 def _to_audio_tensor(wav):
-    """Ensure audio is a 2D torch tensor shaped [1, T]."""
-    if isinstance(wav, torch.Tensor):
-        tensor = wav
+    """Ensure audio is a 2D CPU torch tensor shaped [1, T]."""
+    tensor = _ensure_mono_2d(wav)
+    return tensor if tensor.device.type == "cpu" else tensor.cpu()
+
+def _ref_autocast():
+    """Autocast context for the reference encoder, per QWEN_TTS_REF_PRECISION."""
+    dtype = _REF_AUTOCAST_DTYPES.get(REF_PRECISION)
+    if dtype is None or not DEVICE.startswith("cuda"):
+        return nullcontext()
+    return torch.autocast(device_type="cuda", dtype=dtype)
+
+def _get_cached_prompt(key: tuple):
+    """Return cached voice-clone prompt items for key, or None."""
+    with _PROMPT_CACHE_LOCK:
+        items = _PROMPT_CACHE.get(key)
+        if items is not None:
+            _PROMPT_CACHE.move_to_end(key)
+        return items
+
+def _put_cached_prompt(key: tuple, items: list):
+    """Cache voice-clone prompt items, dropping the least recently used beyond PROMPT_CACHE_SIZE."""
+    items = [
+        replace(
+            it,
+            ref_code=it.ref_code.to(DEVICE) if it.ref_code is not None else None,
+            # Undo any autocast dtype so cached prompts match the model's own
+            ref_spk_embedding=it.ref_spk_embedding.to(DEVICE, dtype=DTYPE),
+        )
+        for it in items
+    ]
+    with _PROMPT_CACHE_LOCK:
+        _PROMPT_CACHE[key] = items
+        _PROMPT_CACHE.move_to_end(key)
+        while len(_PROMPT_CACHE) > PROMPT_CACHE_SIZE:
+            _PROMPT_CACHE.popitem(last=False)
+    return items
+
+TRIM_TOP_DB = 40.0
+TRIM_MIN_SECONDS = 0.5  # shorter trimmed clips fall back to the full upload
+_TRIM_FRAME = 256  # ~21 ms at 12 kHz
+
+def _trim_silence(waveform: torch.Tensor, sr: int, top_db: float = TRIM_TOP_DB) -> torch.Tensor:
+    """Drop leading/trailing frames more than top_db below the loudest frame of a [1, T] clip."""
+    n = waveform.shape[-1]
+    nframes = n // _TRIM_FRAME
+    if nframes == 0:
+        return waveform
+    rms = waveform[0, : nframes * _TRIM_FRAME].reshape(nframes, _TRIM_FRAME).pow(2).mean(dim=1).sqrt()
+    peak = rms.max()
+    if peak <= 0:
+        return waveform
+    active = torch.nonzero(rms >= peak * 10 ** (-top_db / 20)).flatten()
+    first, last = active[0].item(), active[-1].item()
+    start = first * _TRIM_FRAME
+    # Keep the partial frame at the end when speech runs up to it
+    end = n if last == nframes - 1 else (last + 1) * _TRIM_FRAME
+    if end - start < TRIM_MIN_SECONDS * sr or (start == 0 and end == n):
+        return waveform
+    logger.info(f"Trimmed {1 - (end - start) / n:.0%} silence from reference audio")
+    return waveform[:, start:end]
+
+# Upload rates the audio I/O warmup builds resamplers for
+WARMUP_SAMPLE_RATES = (8000, 16000, 22050, 24000, 44100, 48000)
+
+@lru_cache(maxsize=16)
+def _resampler(orig_sr: int) -> torchaudio.transforms.Resample:
+    """Resample transform to 12 kHz, holding its precomputed sinc kernel for reuse."""
+    return torchaudio.transforms.Resample(orig_sr, 12000)
+
+def _decode_and_resample(content: bytes):
+    """Decode uploaded reference audio into a mono 12 kHz (numpy, sr) tuple."""
+    waveform = None
+    if sf is not None:
+        try:
+            # Mono files come back 1-D and contiguous; others are [T, C] and mixed down in one pass
+            data, sample_rate = sf.read(io.BytesIO(content), dtype="float32")
+            waveform = _ensure_mono_2d(data, channel_axis=1)
+        except RuntimeError:
+            pass
+    if waveform is None:
+        # Formats libsndfile can't read (e.g. mp3 on older builds)
+        waveform, sample_rate = torchaudio.load(io.BytesIO(content))
+        waveform = _ensure_mono_2d(waveform, channel_axis=0)
+    
+    # Resample after the mixdown so only one channel goes through the filter
+    if sample_rate != 12000:
+        waveform = _resampler(sample_rate)(waveform)
+        sample_rate = 12000
+    
+    return _trim_silence(waveform, sample_rate)[0].numpy(), sample_rate
+
+def _warmup_audio_io():
+    """Build resample kernels for common upload rates and exercise the decode path once."""
+    try:
+        # Compile (or load from cache) the [C, T] and soundfile's [T, C] mixdown
+        _mono_mixdown_f32(np.zeros((2, 8), dtype=np.float32))
+        _mono_mixdown_tc_f32(np.zeros((8, 2), dtype=np.float32))
+        for orig_sr in WARMUP_SAMPLE_RATES:
+            _resampler(orig_sr)(torch.zeros(1, orig_sr))
+        if sf is not None:
+            buf = io.BytesIO()
+            sf.write(buf, torch.zeros(160).numpy(), 16000, format="WAV", subtype="PCM_16")
+            _decode_and_resample(buf.getvalue())
+    except Exception as e:
+        logger.warning(f"Audio I/O warmup failed: {e}")
+
+def _wav_response(wav, sr: int, filename: str) -> Response:
+    """Encode audio as 16-bit PCM WAV in memory and return it as an attachment."""
+    # Clamp before quantising: out-of-range peaks would otherwise wrap around in PCM_16
+    audio_tensor = _to_audio_tensor(wav).float().clamp(-1.0, 1.0)
+    buf = io.BytesIO()
+    if sf is not None:
+        sf.write(buf, audio_tensor.squeeze(0).numpy(), sr, format="WAV", subtype="PCM_16")
     else:
-        tensor = torch.from_numpy(wav)
+        torchaudio.save(buf, audio_tensor, sr, format="wav", encoding="PCM_S", bits_per_sample=16)
+    return Response(
+        content=buf.getvalue(),
+        media_type="audio/wav",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-    if tensor.dim() == 1:
-        tensor = tensor.unsqueeze(0)
-    elif tensor.dim() == 2 and tensor.shape[0] > 1:
-        tensor = torch.mean(tensor, dim=0, keepdim=True)
-    return tensor.cpu()
+def _run_batch(model, method: str, shared: dict, items: list):
+    """Run one generate_* call for a batch of per-request inputs."""
+    fn = getattr(model, method)
+    with torch.inference_mode():
+        if len(items) == 1:
+            return fn(**shared, **items[0])
+        # List values (voice-clone prompts) are already per-sample lists, so concatenate them
+        merged = {
+            k: sum((it[k] for it in items), []) if isinstance(items[0][k], list) else [it[k] for it in items]
+            for k in items[0]
+        }
+        wavs, sr = fn(**shared, **merged)
+    if len(wavs) != len(items):
+        raise RuntimeError(f"Batched {method} returned {len(wavs)} clips for {len(items)} inputs")
+    return wavs, sr
+
+def _build_clone_prompt(model, ref_audio, ref_text: Optional[str], x_vector_only: bool):
+    """Encode a reference clip into voice-clone prompt items."""
+    with torch.inference_mode(), _ref_autocast():
+        return model.create_voice_clone_prompt(
+            ref_audio=ref_audio,
+            ref_text=ref_text,
+            x_vector_only_mode=x_vector_only,
+        )
+
+async def _batch_worker():
+    """Drain the queue, group compatible requests, and resolve each request's future."""
+    loop = asyncio.get_running_loop()
+    while True:
+        pending = [await _BATCH_QUEUE.get()]
+        if BATCH_MAX_SIZE > 1:
+            await asyncio.sleep(BATCH_WINDOW_MS / 1000.0)
+            while len(pending) < BATCH_MAX_SIZE and not _BATCH_QUEUE.empty():
+                pending.append(_BATCH_QUEUE.get_nowait())
+        
+        groups = {}
+        for job in pending:
+            groups.setdefault(job[0], []).append(job)
+        for jobs in groups.values():
+            _, model, method, shared, _, _ = jobs[0]
+            items = [job[4] for job in jobs]
+            try:
+                wavs, sr = await loop.run_in_executor(_GEN_POOL, _run_batch, model, method, shared, items)
+            except Exception as e:
+                for job in jobs:
+                    if not job[5].done():
+                        job[5].set_exception(e)
+                continue
+            for job, wav in zip(jobs, wavs):
+                if not job[5].done():
+                    job[5].set_result((wav, sr))
+
+async def _generate(model, method: str, shared: dict, item: dict):
+    """Queue one request for the batch worker and wait for its (wav, sr)."""
+    future = asyncio.get_running_loop().create_future()
+    key = (id(model), method, tuple(sorted(shared.items())))
+    await _BATCH_QUEUE.put((key, model, method, shared, item, future))
+    return await future
+
+# Sampling parameters shared by every endpoint and forwarded to generate_*
+_KWARG_KEYS = (
+    "max_new_tokens",
+    "temperature",
+    "top_k",
+    "top_p",
+    "repetition_penalty",
+    "do_sample",
+    "subtalker_dosample",
+    "subtalker_temperature",
+    "subtalker_top_k",
+    "subtalker_top_p",
+)
+
+def _require_model(tts_model, model_kind, supported: tuple, feature: str):
+    """Raise the HTTP error for a missing model or one that can't serve this endpoint."""
+    if tts_model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if model_kind not in supported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{feature} not supported for {model_kind} model"
+        )
+
+async def _run_generate(tts_model, method: str, params: dict, item: dict, filename: str) -> Response:
+    """Generate one clip through the batcher and return it as a WAV attachment."""
+    kwargs = {k: params[k] for k in _KWARG_KEYS}
+    kwargs.update(CACHE_KWARGS)
+    wav, sr = await _generate(tts_model, method, kwargs, item)
+    return _wav_response(wav, sr, filename)
 
 @app.on_event("startup")
 async def load_model():
     """Load the TTS model on startup"""
+    global _BATCH_QUEUE, _BATCH_TASK, _WARMUP_TASK
+    # Submitted to a worker thread right away, so it overlaps the blocking model load below;
+    # a to_thread task would not start until the loop regained control after the load
+    _WARMUP_TASK = asyncio.get_running_loop().run_in_executor(_IO_POOL, _warmup_audio_io)
     checkpoint = MODEL_OPTIONS.get(DEFAULT_MODEL, DEFAULT_MODEL)
     _load_model(checkpoint)
+    _BATCH_QUEUE = asyncio.Queue()
+    _BATCH_TASK = asyncio.create_task(_batch_worker())
 
 # ============= Pydantic Models =============
 
@@ -135,6 +722,7 @@ class ModelSwitchRequest(BaseModel):
 @app.get("/health")
 async def health():
     """Health check"""
+    tts_model, model_kind, _ = _active_model()
     return {
         "status": "healthy",
         "model_loaded": tts_model is not None,
@@ -153,53 +741,19 @@ async def voice_design(request: VoiceDesignRequest):
         "language": "Auto"
     }
     """
-    if tts_model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
-    if model_kind not in ["voice_design", "base"]:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Voice design not supported for {model_kind} model"
-        )
-    
-    try:
-        kwargs = {
-            "max_new_tokens": request.max_new_tokens,
-            "temperature": request.temperature,
-            "top_k": request.top_k,
-            "top_p": request.top_p,
-            "repetition_penalty": request.repetition_penalty,
-            "do_sample": request.do_sample,
-            "subtalker_dosample": request.subtalker_dosample,
-            "subtalker_temperature": request.subtalker_temperature,
-            "subtalker_top_k": request.subtalker_top_k,
-            "subtalker_top_p": request.subtalker_top_p,
-        }
-        
-        with torch.no_grad():
-            wavs, sr = tts_model.generate_voice_design(
-                text=request.text,
-                language=request.language,
-                instruct=request.instruct,
-                **kwargs
+    with _acquire_model() as (tts_model, model_kind, _):
+        _require_model(tts_model, model_kind, ("voice_design", "base"), "Voice design")
+        try:
+            return await _run_generate(
+                tts_model,
+                "generate_voice_design",
+                request.model_dump(),
+                {"text": request.text, "language": request.language, "instruct": request.instruct},
+                "voice_design.wav",
             )
-        
-        # Save to temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        audio_tensor = _to_audio_tensor(wavs[0])
-        torchaudio.save(temp_file.name, audio_tensor, sr)
-        temp_file.close()
-        
-        return FileResponse(
-            temp_file.name,
-            media_type="audio/wav",
-            filename="voice_design.wav",
-            background=lambda: os.unlink(temp_file.name)
-        )
-        
-    except Exception as e:
-        logger.error(f"Voice design error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            logger.error(f"Voice design error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/custom-voice")
 async def custom_voice(request: CustomVoiceRequest):
@@ -214,53 +768,24 @@ async def custom_voice(request: CustomVoiceRequest):
         "language": "Auto"
     }
     """
-    if tts_model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
-    if model_kind != "custom_voice":
-        raise HTTPException(
-            status_code=400,
-            detail=f"Custom voice not supported for {model_kind} model"
-        )
-    
-    try:
-        kwargs = {
-            "max_new_tokens": request.max_new_tokens,
-            "temperature": request.temperature,
-            "top_k": request.top_k,
-            "top_p": request.top_p,
-            "repetition_penalty": request.repetition_penalty,
-            "do_sample": request.do_sample,
-            "subtalker_dosample": request.subtalker_dosample,
-            "subtalker_temperature": request.subtalker_temperature,
-            "subtalker_top_k": request.subtalker_top_k,
-            "subtalker_top_p": request.subtalker_top_p,
-        }
-        
-        with torch.no_grad():
-            wavs, sr = tts_model.generate_custom_voice(
-                text=request.text,
-                language=request.language,
-                speaker=request.speaker,
-                instruct=request.instruct,
-                **kwargs
+    with _acquire_model() as (tts_model, model_kind, _):
+        _require_model(tts_model, model_kind, ("custom_voice",), "Custom voice")
+        try:
+            return await _run_generate(
+                tts_model,
+                "generate_custom_voice",
+                request.model_dump(),
+                {
+                    "text": request.text,
+                    "language": request.language,
+                    "speaker": request.speaker,
+                    "instruct": request.instruct,
+                },
+                "custom_voice.wav",
             )
-        
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        audio_tensor = _to_audio_tensor(wavs[0])
-        torchaudio.save(temp_file.name, audio_tensor, sr)
-        temp_file.close()
-        
-        return FileResponse(
-            temp_file.name,
-            media_type="audio/wav",
-            filename="custom_voice.wav",
-            background=lambda: os.unlink(temp_file.name)
-        )
-        
-    except Exception as e:
-        logger.error(f"Custom voice error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            logger.error(f"Custom voice error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/voice-clone")
 async def voice_clone(
@@ -285,88 +810,50 @@ async def voice_clone(
     
     Upload reference audio file and provide transcript (unless x_vector_only=true)
     """
-    if tts_model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
-    if model_kind != "base":
-        raise HTTPException(
-            status_code=400,
-            detail=f"Voice cloning not supported for {model_kind} model"
-        )
-    
-    try:
-        # Save uploaded audio
-        temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        content = await ref_audio.read()
-        temp_audio.write(content)
-        temp_audio.close()
-        
-        # Load and process audio
-        waveform, sample_rate = torchaudio.load(temp_audio.name)
-        
-        # Resample if needed
-        if sample_rate != 12000:
-            waveform = torchaudio.functional.resample(waveform, sample_rate, 12000)
-            sample_rate = 12000
-        
-        # Ensure mono
-        if waveform.shape[0] > 1:
-            waveform = torch.mean(waveform, dim=0, keepdim=True)
-        
-        ref_audio_tuple = (waveform[0].numpy(), sample_rate)
-        
-        kwargs = {
-            "max_new_tokens": max_new_tokens,
-            "temperature": temperature,
-            "top_k": top_k,
-            "top_p": top_p,
-            "repetition_penalty": repetition_penalty,
-            "do_sample": do_sample,
-            "subtalker_dosample": subtalker_dosample,
-            "subtalker_temperature": subtalker_temperature,
-            "subtalker_top_k": subtalker_top_k,
-            "subtalker_top_p": subtalker_top_p,
-        }
-        
-        with torch.no_grad():
-            wavs, sr = tts_model.generate_voice_clone(
-                text=text,
-                language=language,
-                ref_audio=ref_audio_tuple,
-                ref_text=ref_text if ref_text else None,
-                x_vector_only_mode=x_vector_only,
-                **kwargs
-            )
-        
-        # Clean up uploaded file
-        os.unlink(temp_audio.name)
-        
-        # Save output
-        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        audio_tensor = _to_audio_tensor(wavs[0])
-        torchaudio.save(temp_output.name, audio_tensor, sr)
-        temp_output.close()
-        
-        return FileResponse(
-            temp_output.name,
-            media_type="audio/wav",
-            filename="voice_clone.wav",
-            background=lambda: os.unlink(temp_output.name)
-        )
-        
-    except Exception as e:
-        logger.error(f"Voice clone error: {e}")
-        # Clean up temp files
+    params = {
+        "max_new_tokens": max_new_tokens,
+        "temperature": temperature,
+        "top_k": top_k,
+        "top_p": top_p,
+        "repetition_penalty": repetition_penalty,
+        "do_sample": do_sample,
+        "subtalker_dosample": subtalker_dosample,
+        "subtalker_temperature": subtalker_temperature,
+        "subtalker_top_k": subtalker_top_k,
+        "subtalker_top_p": subtalker_top_p,
+    }
+    with _acquire_model() as (tts_model, model_kind, model_checkpoint):
+        _require_model(tts_model, model_kind, ("base",), "Voice cloning")
         try:
-            if 'temp_audio' in locals():
-                os.unlink(temp_audio.name)
-        except:
-            pass
-        raise HTTPException(status_code=500, detail=str(e))
+            content = await ref_audio.read()
+            ref_text = ref_text if ref_text else None
+            prompt_key = (model_checkpoint, hashlib.sha1(content).hexdigest(), ref_text, bool(x_vector_only))
+            voice_clone_prompt = _get_cached_prompt(prompt_key)
+            
+            if voice_clone_prompt is None:
+                loop = asyncio.get_running_loop()
+                ref_audio_tuple = await loop.run_in_executor(_IO_POOL, _decode_and_resample, content)
+                # The speaker encoder is GPU work, so it queues on the generation thread
+                voice_clone_prompt = await loop.run_in_executor(
+                    _GEN_POOL, _build_clone_prompt, tts_model, ref_audio_tuple, ref_text, x_vector_only
+                )
+                voice_clone_prompt = _put_cached_prompt(prompt_key, voice_clone_prompt)
+            
+            return await _run_generate(
+                tts_model,
+                "generate_voice_clone",
+                params,
+                {"text": text, "language": language, "voice_clone_prompt": voice_clone_prompt},
+                "voice_clone.wav",
+            )
+        except Exception as e:
+            logger.error(f"Voice clone error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/info")
 async def get_info():
     """Get model information and capabilities"""
+    tts_model, model_kind, model_checkpoint = _active_model()
     if tts_model is None:
         return {"status": "Model not loaded"}
     
@@ -402,7 +889,9 @@ async def load_model_endpoint(request: ModelSwitchRequest):
         raise HTTPException(status_code=400, detail="Unknown model or checkpoint")
 
     try:
-        _load_model(checkpoint)
+        # Off the event loop: eviction waits for in-flight requests, which need the loop to finish
+        await asyncio.to_thread(_load_model, checkpoint)
+        _, model_kind, model_checkpoint = _active_model()
         return {
             "status": "ok",
             "model_type": model_kind,
@@ -0,0 +1,67 @@
+"""Graphed vocoder replay must match the eager decoder it wraps."""
+
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+pytest.importorskip("qwen_tts")
+if not torch.cuda.is_available():
+    pytest.skip("CUDA graphs need a CUDA device", allow_module_level=True)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from qwen_tts_api import _GraphedVocoder  # noqa: E402
+
+
+class _CausalDecoder(torch.nn.Module):
+    """Left-padded conv + 4x upsample, so trailing padding can't reach earlier samples."""
+
+    def __init__(self):
+        super().__init__()
+        self.conv = torch.nn.Conv1d(8, 8, kernel_size=3)
+        self.up = torch.nn.ConvTranspose1d(8, 1, kernel_size=4, stride=4)
+
+    def forward(self, x):
+        return self.up(torch.relu(self.conv(torch.nn.functional.pad(x, (2, 0)))))
+
+
+class _LengthDependentDecoder(_CausalDecoder):
+    """Normalises over time, so zero padding changes every output sample."""
+
+    def forward(self, x):
+        return super().forward(x - x.mean(dim=-1, keepdim=True))
+
+
+@pytest.mark.parametrize("length", [1, 37, 64, 100, 300])
+def test_graphed_matches_eager(length):
+    decoder = _CausalDecoder().cuda().eval()
+    graphed = _GraphedVocoder(decoder)
+    with torch.inference_mode():
+        for seed in range(3):
+            torch.manual_seed(seed)
+            x = torch.randn(1, 8, length, device="cuda")
+            torch.testing.assert_close(graphed(x), decoder(x))
+    assert any(entry is not None for entry in graphed._graphs.values())
+
+
+@pytest.mark.parametrize("first_length", [50, 64])
+def test_length_dependent_decoder_stays_eager(first_length):
+    # 64 fills its bucket exactly, so the capture must verify on a padded input
+    decoder = _LengthDependentDecoder().cuda().eval()
+    graphed = _GraphedVocoder(decoder)
+    with torch.inference_mode():
+        for length in (first_length, 50):
+            x = torch.randn(1, 8, length, device="cuda")
+            torch.testing.assert_close(graphed(x), decoder(x))
+    assert list(graphed._graphs.values()) == [None]
+
+
+def test_long_inputs_run_eagerly():
+    decoder = _CausalDecoder().cuda().eval()
+    graphed = _GraphedVocoder(decoder)
+    with torch.inference_mode():
+        x = torch.randn(1, 8, 600, device="cuda")
+        torch.testing.assert_close(graphed(x), decoder(x))
+    assert graphed._graphs == {}